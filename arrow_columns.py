@@ -0,0 +1,60 @@
+"""Arrow column builders shared by the crypto and weather collectors and the weather backfill."""
+
+from array import array
+import pyarrow as pa
+
+TIMESTAMP = pa.timestamp('ms', tz='UTC')
+
+# Weather prices and sizes are stored as fixed-point integers: value = round(x * FIXED_SCALE).
+# Prices live in [0, 1] and fit int32; sizes can exceed int32's 2147 units at this
+# scale, so they are int64. The scale is recorded in each field's metadata.
+FIXED_SCALE = 1_000_000
+FIXED_METADATA = {'scale': '6'}
+PRICE = pa.int32()
+SIZE = pa.int64()
+
+# array typecodes matching the Arrow storage types a book level can use
+_TYPECODES = {pa.int32(): 'i', pa.int64(): 'q', pa.float64(): 'd'}
+
+def to_fixed(value):
+    return round(float(value) * FIXED_SCALE)
+
+def price_field(name):
+    return pa.field(name, PRICE, metadata=FIXED_METADATA)
+
+def size_field(name):
+    return pa.field(name, SIZE, metadata=FIXED_METADATA)
+
+def timestamp_column(ms):
+    # The array('q') of epoch ms already has timestamp('ms') layout, so it is wrapped as the
+    # column's data buffer without a copy (pa.array would iterate it element by element).
+    # Callers must not append to the buffer afterwards; the loggers swap in fresh arrays.
+    return pa.Array.from_buffers(TIMESTAMP, len(ms), [None, pa.py_buffer(ms)])
+
+def book_column(books, book_type, convert=float):
+    """Builds a list<struct<price, size>> column of `book_type` from buffered level lists in one pass.
+
+    `convert` turns a raw price or size into the level's storage type (float, or to_fixed).
+    """
+    level_type = book_type.value_type
+    price_type, size_type = level_type.field(0).type, level_type.field(1).type
+    offsets = array('i', [0])
+    prices, sizes = array(_TYPECODES[price_type]), array(_TYPECODES[size_type])
+    skipped = 0
+    for levels in books:
+        for level in levels:
+            # One malformed level is dropped on its own instead of failing the whole flush
+            try:
+                price, size = convert(level['price']), convert(level['size'])
+            except (KeyError, TypeError, ValueError, OverflowError):
+                skipped += 1
+                continue
+            prices.append(price)
+            sizes.append(size)
+        offsets.append(len(prices))
+    if skipped:
+        print(f"[Flush] Skipped {skipped} malformed book levels")
+    levels = pa.StructArray.from_arrays(
+        [pa.array(prices, type=price_type), pa.array(sizes, type=size_type)],
+        fields=list(level_type))
+    return pa.ListArray.from_arrays(pa.array(offsets, type=pa.int32()), levels, type=book_type)
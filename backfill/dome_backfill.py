@@ -3,7 +3,7 @@ Dome API Historical Backfill Script
 ====================================
 Downloads all available historical Polymarket crypto market data
 by generating historical slugs using the same naming convention
-as fetch_tokens.js, then querying Dome API for trades, orderbooks,
+as crypto/fetch_tokens.py, then querying Dome API for trades, orderbooks,
 and OHLCV candlesticks.
 
 Usage:
@@ -16,6 +16,8 @@ import sys
 import time
 import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import datetime
 import pandas as pd
 
@@ -26,6 +28,7 @@ BASE_URL = "https://api.domeapi.io/v1"
 _ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(_ROOT, "data")
 RATE_LIMIT_SLEEP = 0.15  # ~7 QPS to stay under the 10 QPS free tier
+RATE_LIMITED_SLEEP = 10  # Fallback wait on a 429 without a Retry-After header
 
 # How many days back to generate slugs for
 DAYS_BACK = 120  # ~4 months of historical data
@@ -37,51 +40,65 @@ COINS = {
 
 # ─── API Helpers ─────────────────────────────────────────────────────────────
 
-def dome_get(endpoint, params=None, retries=3):
-    """Make a rate-limited GET request to the Dome API with automatic retries for 50x errors."""
-    headers = {"Authorization": f"Bearer {DOME_API_KEY}"}
+class DomeAPIError(Exception):
+    """A Dome request still failing after retries; callers must not save partial data."""
+
+# One pooled keep-alive session for every Dome call; urllib3 retries 5xx and network
+# errors with backoff. 429s are left to dome_get(), which waits them out indefinitely.
+SESSION = requests.Session()
+SESSION.headers["Authorization"] = f"Bearer {DOME_API_KEY}"
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[500, 502, 503, 504],
+        raise_on_status=False,
+    ),
+))
+
+def dome_get(endpoint, params=None):
+    """Make a rate-limited GET request to the Dome API over the shared session."""
     url = f"{BASE_URL}{endpoint}"
     
-    time.sleep(RATE_LIMIT_SLEEP)
-    
-    resp = None
+    while True:
+        time.sleep(RATE_LIMIT_SLEEP)
+        
+        try:
+            resp = SESSION.get(url, params=params, timeout=30)
+        except Exception as e:
+            raise DomeAPIError(f"{url}: {e}") from e
+        
+        # Rate limits are retried until they clear, so a long 429 streak never truncates a download
+        if resp.status_code != 429:
+            break
+        try:
+            wait = float(resp.headers.get("Retry-After", RATE_LIMITED_SLEEP))
+        except ValueError:
+            wait = RATE_LIMITED_SLEEP
+        print(f"  [RATE LIMITED] Sleeping {wait:.0f}s...")
+        time.sleep(wait)
+        
+    # Handle 404/400 gracefully
+    if resp.status_code == 404 or resp.status_code == 400:
+        return None  # Market doesn't exist or bad slug, silently skip
+        
+    if resp.status_code >= 500:
+        raise DomeAPIError(f"HTTP {resp.status_code} for {url} after retries")
+        
+    if not resp.ok:
+        print(f"  [HTTP ERROR {resp.status_code}] {url} -> {(params or {}).get('market_slug', '...')}")
+        return None
+        
     try:
-        resp = requests.get(url, headers=headers, params=params, timeout=30)
-        resp.raise_for_status()
         return resp.json()
-    except requests.exceptions.HTTPError as e:
-        status = resp.status_code if resp is not None else 500
-        
-        # Handle 429 Too Many Requests
-        if status == 429:
-            print(f"  [RATE LIMITED] Sleeping 10s...")
-            time.sleep(10)
-            return dome_get(endpoint, params, retries)
-            
-        # Handle 404/400 gracefully
-        if status == 404 or status == 400:
-            return None  # Market doesn't exist or bad slug, silently skip
-            
-        # Handle 502 Bad Gateway / 504 Gateway Timeout
-        if status in [500, 502, 503, 504] and retries > 0:
-            # Backoff before retrying
-            sleep_time = (4 - retries) * 2
-            print(f"  [SERVER ERROR {status}] Retrying in {sleep_time}s... ({retries-1} left) -> {params.get('market_slug', '...')}")
-            time.sleep(sleep_time)
-            return dome_get(endpoint, params, retries - 1)
-            
-        print(f"  [HTTP ERROR] {e}")
-        return None
-    except Exception as e:
-        if retries > 0:
-            print(f"  [NETWORK ERROR] Retrying in 2s... ({retries-1} left)")
-            time.sleep(2)
-            return dome_get(endpoint, params, retries - 1)
+    except ValueError as e:
         print(f"  [ERROR] {e}")
         return None
 
 
-# ─── Slug Generation (Mirrors fetch_tokens.js logic) ────────────────────────
+# ─── Slug Generation (Mirrors fetch_tokens.py logic) ────────────────────────
 
 def generate_1h_slugs(coin_long, target_date):
     """
@@ -153,7 +170,11 @@ def discover_markets_by_slugs():
             
             for slug in slugs:
                 # Try to fetch market info from Dome
-                data = dome_get("/polymarket/markets", {"market_slug": slug, "limit": 1})
+                try:
+                    data = dome_get("/polymarket/markets", {"market_slug": slug, "limit": 1})
+                except DomeAPIError as e:
+                    print(f"  [ERROR] {e}")
+                    data = None
                 if not data:
                     missed_1h += 1
                     continue
@@ -192,7 +213,11 @@ def discover_markets_by_slugs():
                 if pagination_key:
                     params["pagination_key"] = pagination_key
                 
-                data = dome_get("/polymarket/markets", params)
+                try:
+                    data = dome_get("/polymarket/markets", params)
+                except DomeAPIError as e:
+                    print(f"  [ERROR] {e}")
+                    break
                 if not data:
                     break
                 
@@ -465,36 +490,41 @@ def backfill_binance_prices():
             all_prices = []
             pagination_key = None
             
-            while True:
-                params = {
-                    "currency": pair,
-                    "start_time": start_ms,
-                    "end_time": end_ms,
-                    "limit": 100,
-                }
-                if pagination_key:
-                    params["pagination_key"] = pagination_key
+            try:
+                while True:
+                    params = {
+                        "currency": pair,
+                        "start_time": start_ms,
+                        "end_time": end_ms,
+                        "limit": 100,
+                    }
+                    if pagination_key:
+                        params["pagination_key"] = pagination_key
                 
-                data = dome_get("/crypto/prices/binance", params)
-                if not data:
-                    break
+                    data = dome_get("/crypto/prices/binance", params)
+                    if not data:
+                        break
                 
-                prices = data.get("prices", data.get("data", []))
-                if not prices:
-                    break
+                    prices = data.get("prices", data.get("data", []))
+                    if not prices:
+                        break
                 
-                for p in prices:
-                    all_prices.append({
-                        "timestamp": p.get("timestamp", 0),
-                        "price": float(p.get("value", 0)),
-                        "symbol": p.get("symbol", pair),
-                    })
+                    for p in prices:
+                        all_prices.append({
+                            "timestamp": p.get("timestamp", 0),
+                            "price": float(p.get("value", 0)),
+                            "symbol": p.get("symbol", pair),
+                        })
                 
-                # Check pagination
-                pag_key = data.get("pagination_key")
-                if not pag_key or pag_key == pagination_key:
-                    break
-                pagination_key = pag_key
+                    # Check pagination
+                    pag_key = data.get("pagination_key")
+                    if not pag_key or pag_key == pagination_key:
+                        break
+                    pagination_key = pag_key
+            except DomeAPIError as e:
+                # Leave the day unwritten so the next run fetches it whole
+                print(f"  [ERROR] {date_str}: {e}")
+                continue
             
             if all_prices:
                 df = pd.DataFrame(all_prices)
@@ -543,35 +573,40 @@ def backfill_chainlink_prices():
             all_prices = []
             pagination_key = None
             
-            while True:
-                params = {
-                    "currency": pair,
-                    "start_time": start_ms,
-                    "end_time": end_ms,
-                    "limit": 100,
-                }
-                if pagination_key:
-                    params["pagination_key"] = pagination_key
+            try:
+                while True:
+                    params = {
+                        "currency": pair,
+                        "start_time": start_ms,
+                        "end_time": end_ms,
+                        "limit": 100,
+                    }
+                    if pagination_key:
+                        params["pagination_key"] = pagination_key
                 
-                data = dome_get("/crypto-prices/chainlink", params)
-                if not data:
-                    break
+                    data = dome_get("/crypto-prices/chainlink", params)
+                    if not data:
+                        break
                 
-                prices = data.get("prices", data.get("data", []))
-                if not prices:
-                    break
+                    prices = data.get("prices", data.get("data", []))
+                    if not prices:
+                        break
                 
-                for p in prices:
-                    all_prices.append({
-                        "timestamp": p.get("timestamp", 0),
-                        "price": float(p.get("value", 0)),
-                        "symbol": p.get("symbol", pair),
-                    })
+                    for p in prices:
+                        all_prices.append({
+                            "timestamp": p.get("timestamp", 0),
+                            "price": float(p.get("value", 0)),
+                            "symbol": p.get("symbol", pair),
+                        })
                 
-                pag_key = data.get("pagination_key")
-                if not pag_key or pag_key == pagination_key:
-                    break
-                pagination_key = pag_key
+                    pag_key = data.get("pagination_key")
+                    if not pag_key or pag_key == pagination_key:
+                        break
+                    pagination_key = pag_key
+            except DomeAPIError as e:
+                # Leave the day unwritten so the next run fetches it whole
+                print(f"  [ERROR] {date_str}: {e}")
+                continue
             
             if all_prices:
                 df = pd.DataFrame(all_prices)
@@ -10,18 +10,36 @@ import sys
 import time
 import json
 import argparse
-import requests
+import asyncio
+import aiohttp
+from aiolimiter import AsyncLimiter
 import datetime
+import functools
+from array import array
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# ── Allow running directly as `python backfill/weather_backfill.py` ─────────
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _ROOT)
+
+from arrow_columns import PRICE, SIZE, price_field, size_field, to_fixed
 
 # ─── Configuration ───────────────────────────────────────────────────────────
 
 DOME_API_KEY = os.environ.get("DOME_API_KEY", "f2e46c2395d9d74419feea87eae520cafbe44eaa")
 BASE_URL = "https://api.domeapi.io/v1"
 GAMMA_URL = "https://gamma-api.polymarket.com/events"
-_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(_ROOT, "data", "weather")
-RATE_LIMIT_SLEEP = 0.15  # ~7 QPS to stay under the 10 QPS free tier
+DOME_QPS = 7             # Token bucket rate, to stay under the 10 QPS free tier
+GAMMA_CONCURRENCY = 32   # Max in-flight Gamma lookups during discovery
+BUCKET_CONCURRENCY = 8   # Max sub-markets being backfilled (and held in memory) at once
+MISSED_SLUG_TTL_DAYS = 7 # How long a slug that Gamma had no event for is skipped
+UNSETTLED_DAYS = 2       # Target dates this recent may still be listed late, so misses aren't cached
+
+# Shared by every concurrent Dome request; binds to the running loop on first use
+DOME_LIMITER = AsyncLimiter(DOME_QPS, 1)
 
 # How many days back to generate slugs for
 DAYS_BACK = 120
@@ -33,63 +51,84 @@ CITIES = [
 
 # ─── API Helpers ─────────────────────────────────────────────────────────────
 
-def dome_get(endpoint, params=None, retries=3):
-    """Make a rate-limited GET request to the Dome API with automatic retries for 50x errors."""
-    headers = {"Authorization": f"Bearer {DOME_API_KEY}"}
-    url = f"{BASE_URL}{endpoint}"
+class DomeAPIError(Exception):
+    """A Dome request still failing after retries; callers must not save partial data."""
+
+async def dome_get(session, endpoint, params=None, retries=3):
+    """Make a rate-limited GET request to the Dome API, retrying 50x and network errors.
     
-    time.sleep(RATE_LIMIT_SLEEP)
+    429s are waited out for as long as they last. Raises DomeAPIError once other failures
+    outlast the retries, so a pagination loop never mistakes an error for the end of data.
+    """
+    url = f"{BASE_URL}{endpoint}"
+    attempt = 0
     
-    resp = None
-    try:
-        resp = requests.get(url, headers=headers, params=params, timeout=30)
-        resp.raise_for_status()
-        return resp.json()
-    except requests.exceptions.HTTPError as e:
-        status = resp.status_code if resp is not None else 500
-        
+    while True:
+        error = None
+        async with DOME_LIMITER:
+            try:
+                async with session.get(url, params=params) as resp:
+                    status = resp.status
+                    if status < 400:
+                        return await resp.json()
+                    retry_after = resp.headers.get("Retry-After")
+            except Exception as e:
+                error = e
+                
+        if error is not None:
+            if attempt >= retries:
+                raise DomeAPIError(f"{url}: {error}") from error
+            attempt += 1
+            print(f"  [NETWORK ERROR] Retrying in 2s...")
+            await asyncio.sleep(2)
+            continue
+            
         # Handle 429 Too Many Requests
         if status == 429:
-            print(f"  [RATE LIMITED] Sleeping 10s...")
-            time.sleep(10)
-            return dome_get(endpoint, params, retries)
+            try:
+                wait = float(retry_after) if retry_after else 10
+            except ValueError:
+                wait = 10
+            print(f"  [RATE LIMITED] Sleeping {wait:.0f}s...")
+            await asyncio.sleep(wait)
+            continue
             
         # Handle 404/400 gracefully
         if status in [404, 400]:
             return None
             
         # Handle 502/504
-        if status in [500, 502, 503, 504] and retries > 0:
-            sleep_time = (4 - retries) * 2
+        if status in [500, 502, 503, 504] and attempt < retries:
+            attempt += 1
+            sleep_time = attempt * 2
             print(f"  [SERVER ERROR {status}] Retrying in {sleep_time}s...")
-            time.sleep(sleep_time)
-            return dome_get(endpoint, params, retries - 1)
+            await asyncio.sleep(sleep_time)
+            continue
             
-        print(f"  [HTTP ERROR] {e}")
-        return None
-    except Exception as e:
-        if retries > 0:
-            print(f"  [NETWORK ERROR] Retrying in 2s...")
-            time.sleep(2)
-            return dome_get(endpoint, params, retries - 1)
-        print(f"  [ERROR] {e}")
-        return None
+        raise DomeAPIError(f"HTTP {status} for {url}")
 
-def gamma_get(slug):
-    """Fetch event details from Gamma API by slug."""
-    url = f"{GAMMA_URL}?slug={slug}"
-    try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        data = r.json()
-        if data and isinstance(data, list) and len(data) > 0:
-            return data[0]
-    except Exception:
-        pass
+async def gamma_get_async(session, slots, slug, missed=None):
+    """Fetch event details from Gamma API by slug. Clean misses are recorded in `missed`."""
+    # The slot is taken before the request so timeouts only cover the request itself,
+    # not the wait for a free connection
+    async with slots:
+        try:
+            async with session.get(GAMMA_URL, params={"slug": slug}) as r:
+                if r.status != 200:
+                    return None
+                data = await r.json()
+        except Exception:
+            return None
+    if isinstance(data, list) and data:
+        return data[0]
+    # Only a clean 200 with an empty result counts as "no such event"
+    if data == [] and missed is not None:
+        missed[slug] = datetime.date.today().isoformat()
     return None
 
 # ─── Slug Generation ─────────────────────────────────────────────────────────
 
+@functools.lru_cache(maxsize=None)
 def generate_weather_slugs(city, target_date):
     """
     Generate weather slug permutations for a specific city and date.
@@ -115,79 +154,110 @@ def generate_weather_slugs(city, target_date):
                 suffix = f"-{y}" if y else ""
                 slugs.append(f"highest-temperature-in-{cv}-on-{m}-{day}{suffix}")
             
-    return list(dict.fromkeys(slugs))
+    return tuple(dict.fromkeys(slugs))
 
 # ─── Market Discovery ────────────────────────────────────────────────────────
 
-def discover_weather_markets(cities, days_back):
-    """Generate historical slugs and scrape the markets/tokens from Gamma API."""
+def _parse_event(city, target_date, slug, event):
+    """Extract the YES token of every sub-market bucket from a Gamma event."""
+    buckets = []
+    
+    for m in event.get("markets", []):
+        condition_id = m.get("conditionId") or m.get("condition_id")
+        question = m.get("question", "")
+        market_slug = m.get("slug", "")
+        
+        try:
+            outcomes = json.loads(m.get("outcomes", "[]"))
+            clobTokenIds = json.loads(m.get("clobTokenIds", "[]"))
+        except Exception:
+            continue
+        
+        yes_token = None
+        for i, outcome in enumerate(outcomes):
+            if outcome.lower() == "yes" and i < len(clobTokenIds):
+                yes_token = clobTokenIds[i]
+                break
+        
+        if condition_id and yes_token:
+            buckets.append({
+                "question": question,
+                "market_slug": market_slug,
+                "condition_id": condition_id,
+                "yes_token": yes_token
+            })
+    
+    if not buckets:
+        return None
+    return {
+        "city": city,
+        "date": target_date.strftime("%Y-%m-%d"),
+        "slug": slug,
+        "event_id": event.get("id"),
+        "buckets": buckets
+    }
+
+def _load_missed_slugs(path):
+    """Load the negative slug cache, dropping entries older than MISSED_SLUG_TTL_DAYS."""
+    try:
+        with open(path, "r") as f:
+            missed = json.load(f)
+    except Exception:
+        return {}
+    cutoff = (datetime.date.today() - datetime.timedelta(days=MISSED_SLUG_TTL_DAYS)).isoformat()
+    return {slug: day for slug, day in missed.items() if day > cutoff}
+
+async def discover_event(session, slots, city, target_date, missed):
+    """Try every slug variant for one city/day at once; the first variant that resolves wins."""
+    # Recent dates are always asked again: a miss there may just be a market not listed yet
+    settled = (datetime.date.today() - target_date).days >= UNSETTLED_DAYS
+    record = missed if settled else None
+    slugs_to_try = [slug for slug in generate_weather_slugs(city, target_date) if not settled or slug not in missed]
+    results = await asyncio.gather(*[gamma_get_async(session, slots, slug, record) for slug in slugs_to_try])
+    
+    for slug, event in zip(slugs_to_try, results):
+        if event:
+            return _parse_event(city, target_date, slug, event)
+    return None
+
+async def discover_async(cities, days_back, missed):
     all_events = []
     today = datetime.date.today()
+    dates = [today - datetime.timedelta(days=days_ago) for days_ago in range(days_back)]
+    
+    slots = asyncio.Semaphore(GAMMA_CONCURRENCY)
+    connector = aiohttp.TCPConnector(limit=GAMMA_CONCURRENCY)
+    # Per-socket limits: a `total` timeout would also count time spent queued for the pool
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=10)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        for city in cities:
+            print(f"\n  [DISCOVERING {city} markets...]")
+            
+            events = await asyncio.gather(*[discover_event(session, slots, city, d, missed) for d in dates])
+            found = [e for e in events if e]
+            all_events.extend(found)
+            
+            print(f"  [{city.upper()} DONE] Total: {len(found)} found, {len(events) - len(found)} missed")
     
+    return all_events
+
+def discover_weather_markets(cities, days_back):
+    """Generate historical slugs and scrape the markets/tokens from Gamma API."""
     print(f"\n{'='*60}")
     print(f"  DISCOVERING WEATHER MARKETS ({days_back} days back)")
     print(f"{'='*60}")
     
-    for city in cities:
-        found = 0
-        missed = 0
-        print(f"\n  [DISCOVERING {city} markets...]")
-        
-        for days_ago in range(days_back):
-            target_date = today - datetime.timedelta(days=days_ago)
-            slugs_to_try = generate_weather_slugs(city, target_date)
-            
-            event = None
-            for slug in slugs_to_try:
-                event = gamma_get(slug)
-                if event:
-                    break
-                    
-            if not event:
-                missed += 1
-                continue
-                
-            markets = event.get("markets", [])
-            buckets = []
-            
-            for m in markets:
-                condition_id = m.get("conditionId") or m.get("condition_id")
-                question = m.get("question", "")
-                market_slug = m.get("slug", "")
-                
-                try:
-                    outcomes = json.loads(m.get("outcomes", "[]"))
-                    clobTokenIds = json.loads(m.get("clobTokenIds", "[]"))
-                except Exception:
-                    continue
-                
-                yes_token = None
-                for i, outcome in enumerate(outcomes):
-                    if outcome.lower() == "yes" and i < len(clobTokenIds):
-                        yes_token = clobTokenIds[i]
-                        break
-                
-                if condition_id and yes_token:
-                    buckets.append({
-                        "question": question,
-                        "market_slug": market_slug,
-                        "condition_id": condition_id,
-                        "yes_token": yes_token
-                    })
-            
-            if buckets:
-                all_events.append({
-                    "city": city,
-                    "date": target_date.strftime("%Y-%m-%d"),
-                    "slug": slug,
-                    "event_id": event.get("id"),
-                    "buckets": buckets
-                })
-                found += 1
-            else:
-                missed += 1
-        
-        print(f"  [{city.upper()} DONE] Total: {found} found, {missed} missed")
+    # Slugs Gamma recently had no event for are not asked about again
+    missed_path = os.path.join(DATA_DIR, "missed_slugs.json")
+    missed = _load_missed_slugs(missed_path)
+    
+    all_events = asyncio.run(discover_async(cities, days_back, missed))
+    
+    try:
+        with open(missed_path, "w") as f:
+            json.dump(missed, f)
+    except Exception as e:
+        print(f"  [WARN] Could not save missed slug cache: {e}")
         
     print(f"\n[DISCOVERY COMPLETE] Total events: {len(all_events)}")
     return all_events
@@ -213,24 +283,32 @@ def _update_manifest(base_dir, condition_id, question):
 
 # ─── Backfill Candlesticks (OHLCV) ───────────────────────────────────────────
 
-def backfill_candlesticks(city, date_str, bucket):
+async def backfill_candlesticks(session, city, date_str, bucket):
     """Download OHLCV candlestick data for a submarket bucket."""
     condition_id = bucket.get("condition_id")
     if not condition_id:
         return 0
         
+    # Use condition_id for a safe, fixed-length filename
+    base_dir = os.path.join(DATA_DIR, city, date_str, "ohlcv")
+    out_path = os.path.join(base_dir, f"{condition_id}_1h.parquet")
+    
+    if os.path.exists(out_path):
+        return -1 # Sentinel for skipped
+        
     now = int(time.time())
     all_candles = []
     
-    # Dome API restricts 1-hour candles to 31-day chunks, so we paginate 3 times (90 days)
-    for months_back in range(3):
-        end_ts = now - (months_back * 30 * 86400)
-        start_ts = end_ts - (30 * 86400)
-        
-        data = dome_get(f"/polymarket/candlesticks/{condition_id}", {
+    # Dome API restricts 1-hour candles to 31-day chunks, so we request 3 (90 days) at once
+    windows = [(now - (m + 1) * 30 * 86400, now - m * 30 * 86400) for m in range(3)]
+    responses = await asyncio.gather(*[
+        dome_get(session, f"/polymarket/candlesticks/{condition_id}", {
             "start_time": start_ts, "end_time": end_ts, "interval": 60
         })
-        
+        for start_ts, end_ts in windows
+    ])
+    
+    for data in responses:
         if not data:
             continue
             
@@ -268,26 +346,17 @@ def backfill_candlesticks(city, date_str, bucket):
         except Exception:
             pass
             
-    # Use condition_id for a safe, fixed-length filename
-    cid = bucket.get("condition_id", "unknown")
-    base_dir = os.path.join(DATA_DIR, city, date_str, "ohlcv")
-    filename = f"{cid}_1h.parquet"
-    out_path = os.path.join(base_dir, filename)
-    
-    if os.path.exists(out_path):
-        return -1 # Sentinel for skipped
-        
     os.makedirs(base_dir, exist_ok=True)
     df.to_parquet(out_path, index=False)
     
     # Write/update a manifest mapping condition_id -> human-readable question
-    _update_manifest(base_dir, cid, bucket.get("question", ""))
+    _update_manifest(base_dir, condition_id, bucket.get("question", ""))
     
     return len(all_candles)
 
 # ─── Backfill Trades ─────────────────────────────────────────────────────────
 
-def backfill_trades(city, date_str, bucket):
+async def backfill_trades(session, city, date_str, bucket):
     """Download all historical trades for the sub-market bucket."""
     market_slug = bucket.get("market_slug")
     cid = bucket.get("condition_id", "unknown")
@@ -309,7 +378,7 @@ def backfill_trades(city, date_str, bucket):
         if pagination_key:
             params["pagination_key"] = pagination_key
         
-        data = dome_get("/polymarket/orders", params)
+        data = await dome_get(session, "/polymarket/orders", params)
         if not data:
             break
         
@@ -359,7 +428,30 @@ def backfill_trades(city, date_str, bucket):
 
 # ─── Backfill Orderbooks (Fall back / Comprehensive) ─────────────────────────
 
-def backfill_orderbooks(city, date_str, bucket):
+# Fixed-point like the live collector, so backfilled and live snapshots load side by side
+BOOK_LEVEL = pa.struct([price_field("price"), size_field("size")])
+BOOK_TYPE = pa.list_(BOOK_LEVEL)
+
+class BookColumn:
+    """Accumulates one side of each snapshot as flat price/size arrays plus list offsets."""
+    def __init__(self):
+        self.offsets = array("i", [0])
+        self.prices = array("i")
+        self.sizes = array("q")
+
+    def append(self, levels):
+        for level in levels:
+            self.prices.append(to_fixed(level.get("price", 0)))
+            self.sizes.append(to_fixed(level.get("size", 0)))
+        self.offsets.append(len(self.prices))
+
+    def to_array(self):
+        levels = pa.StructArray.from_arrays(
+            [pa.array(self.prices, type=PRICE), pa.array(self.sizes, type=SIZE)],
+            fields=list(BOOK_LEVEL))
+        return pa.ListArray.from_arrays(pa.array(self.offsets, type=pa.int32()), levels, type=BOOK_TYPE)
+
+async def backfill_orderbooks(session, city, date_str, bucket):
     """Download L2 orderbook snapshots for the YES token."""
     token_id = bucket.get("yes_token")
     if not token_id:
@@ -367,7 +459,8 @@ def backfill_orderbooks(city, date_str, bucket):
         
     start_ms = int(time.time() * 1000) - (90 * 86400 * 1000)
     end_ms = int(time.time() * 1000)
-    all_snapshots = []
+    timestamps = []
+    bids, asks = BookColumn(), BookColumn()
     pagination_key = None
     
     while True:
@@ -375,7 +468,7 @@ def backfill_orderbooks(city, date_str, bucket):
         if pagination_key:
             params["pagination_key"] = pagination_key
             
-        data = dome_get("/polymarket/orderbooks", params)
+        data = await dome_get(session, "/polymarket/orderbooks", params)
         if not data:
             break
             
@@ -384,11 +477,9 @@ def backfill_orderbooks(city, date_str, bucket):
             break
             
         for snap in snapshots:
-            all_snapshots.append({
-                "timestamp": snap.get("timestamp", 0),
-                "bids": json.dumps(snap.get("bids", [])),
-                "asks": json.dumps(snap.get("asks", [])),
-            })
+            timestamps.append(int(snap.get("timestamp", 0)))
+            bids.append(snap.get("bids", []))
+            asks.append(snap.get("asks", []))
             
         pagination = data.get("pagination", {})
         next_cursor = pagination.get("pagination_key")
@@ -396,14 +487,14 @@ def backfill_orderbooks(city, date_str, bucket):
             break
         pagination_key = next_cursor
         
-    if not all_snapshots:
+    if not timestamps:
         return 0
         
-    df = pd.DataFrame(all_snapshots)
-    try:
-        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms", utc=True)
-    except Exception:
-        pass
+    table = pa.table({
+        "timestamp": pa.array(timestamps, type=pa.timestamp("ms", tz="UTC")),
+        "bids": bids.to_array(),
+        "asks": asks.to_array(),
+    })
         
     # Use condition_id for a safe, fixed-length filename
     cid = bucket.get("condition_id", "unknown")
@@ -415,15 +506,72 @@ def backfill_orderbooks(city, date_str, bucket):
         return -1 # Sentinel for skipped
         
     os.makedirs(base_dir, exist_ok=True)
-    df.to_parquet(out_path, index=False)
+    pq.write_table(table, out_path, compression="zstd")
     
     # Write/update a manifest mapping condition_id -> human-readable question
     _update_manifest(base_dir, cid, bucket.get("question", ""))
     
-    return len(all_snapshots)
+    return len(timestamps)
 
 # ─── Main Execution ─────────────────────────────────────────────────────────
 
+async def _unless_failed(coro):
+    """Runs one data-type backfill; a persistent Dome failure yields None and writes no file."""
+    try:
+        return await coro
+    except DomeAPIError as e:
+        print(f"  [ERROR] {e}")
+        return None
+
+async def backfill_bucket(session, event, bucket):
+    """Fetch OHLCV, trades and orderbooks for one sub-market concurrently."""
+    city, date_str = event["city"], event["date"]
+    counts = await asyncio.gather(
+        _unless_failed(backfill_candlesticks(session, city, date_str, bucket)),
+        _unless_failed(backfill_trades(session, city, date_str, bucket)),
+        _unless_failed(backfill_orderbooks(session, city, date_str, bucket)),
+    )
+    return event, bucket, counts
+
+async def backfill_all(events):
+    """Backfill up to BUCKET_CONCURRENCY sub-markets at a time; DOME_LIMITER paces the actual requests."""
+    # [saved, skipped] per data type, in backfill_bucket() order
+    totals = [[0, 0], [0, 0], [0, 0]]
+    total_buckets = 0
+    
+    # Keeps the limiter's waiter queue and the buffered page data bounded to a few buckets
+    slots = asyncio.Semaphore(BUCKET_CONCURRENCY)
+    
+    async def bounded(session, event, bucket):
+        async with slots:
+            return await backfill_bucket(session, event, bucket)
+    
+    headers = {"Authorization": f"Bearer {DOME_API_KEY}"}
+    timeout = aiohttp.ClientTimeout(total=30)
+    async with aiohttp.ClientSession(headers=headers, timeout=timeout) as session:
+        tasks = [bounded(session, e, bucket) for e in events for bucket in e["buckets"]]
+        
+        for next_done in asyncio.as_completed(tasks):
+            event, bucket, counts = await next_done
+            total_buckets += 1
+            
+            labels = []
+            for total, n in zip(totals, counts):
+                if n is None:
+                    # Nothing was written, so the next run fetches it again
+                    labels.append("ERR")
+                elif n == -1:
+                    total[1] += 1
+                    labels.append("SKIP")
+                else:
+                    total[0] += n
+                    labels.append(str(n))
+            
+            c_str, t_str, o_str = labels
+            print(f"  -> [{event['slug']}] {bucket['question'][:40]}: {c_str} OHLCV | {t_str} Trades | {o_str} Orderbooks")
+    
+    return total_buckets, *totals
+
 def main():
     parser = argparse.ArgumentParser(description="Dome API Weather Markets Backfill")
     parser.add_argument("--discover", action="store_true", help="Force fresh market discovery over Gamma API instead of using local cache.")
@@ -482,50 +630,8 @@ def main():
         print("[ERROR] No weather events found.")
         sys.exit(1)
         
-    total_candles = 0
-    total_orderbooks = 0
-    total_trades = 0
-    skipped_candles = 0
-    skipped_orderbooks = 0
-    skipped_trades = 0
-    total_buckets = 0
-    
-    for e in events:
-        city = e["city"]
-        date_str = e["date"]
-        buckets = e["buckets"]
-        print(f"\n[PROCESSING] {e['slug']} ({len(buckets)} sub-markets)")
-        
-        for bucket in buckets:
-            total_buckets += 1
-            # 1. Try Candlesticks
-            c = backfill_candlesticks(city, date_str, bucket)
-            if c == -1:
-                skipped_candles += 1
-                c_str = "SKIP"
-            else:
-                total_candles += c
-                c_str = str(c)
-                
-            # 2. Try Trades
-            t = backfill_trades(city, date_str, bucket)
-            if t == -1:
-                skipped_trades += 1
-                t_str = "SKIP"
-            else:
-                total_trades += t
-                t_str = str(t)
-            
-            # 3. Try Orderbooks
-            o = backfill_orderbooks(city, date_str, bucket)
-            if o == -1:
-                skipped_orderbooks += 1
-                o_str = "SKIP"
-            else:
-                total_orderbooks += o
-                o_str = str(o)
-            
-            print(f"  -> {bucket['question'][:40]}: {c_str} OHLCV | {t_str} Trades | {o_str} Orderbooks")
+    totals = asyncio.run(backfill_all(events))
+    total_buckets, (total_candles, skipped_candles), (total_trades, skipped_trades), (total_orderbooks, skipped_orderbooks) = totals
 
     print(f"\n{'='*60}")
     print(f"  BACKFILL COMPLETE!")
@@ -16,6 +16,17 @@ import shared_state
 
 DATA_DIR = os.path.join(_ROOT, "data")
 
+# Buffered rows are plain tuples in this column order; no per-message dict
+TRADE_COLUMNS = ['timestamp', 'price', 'size', 'side']
+TICK_COLUMNS = ['timestamp', 'best_bid', 'best_bid_size', 'best_ask', 'best_ask_size']
+# Declared up front so pandas skips inference; `side` as a categorical is written
+# as a Parquet dictionary column
+TRADE_DTYPES = {'price': 'float64', 'size': 'float64', 'side': 'category'}
+TICK_DTYPES = {'best_bid': 'float64', 'best_bid_size': 'float64', 'best_ask': 'float64', 'best_ask_size': 'float64'}
+
+# Day folders already created this run; a flush only hits the filesystem for a new one
+_created_dirs = set()
+
 class BinanceDataLogger:
     def __init__(self, coin):
         self.coin = coin
@@ -26,22 +37,12 @@ class BinanceDataLogger:
 
     def add_trade(self, timestamp, price, size, is_buyer_maker):
         side = 'SELL' if is_buyer_maker else 'BUY' 
-        self.trades_buffer.append({
-            'timestamp': float(timestamp),
-            'price': float(price),
-            'size': float(size),
-            'side': side
-        })
+        self.trades_buffer.append((float(timestamp), float(price), float(size), side))
         shared_state.state['binance_trades'] += 1
 
     def add_tick(self, timestamp, best_bid, best_bid_size, best_ask, best_ask_size):
-        self.ticks_buffer.append({
-            'timestamp': float(timestamp),
-            'best_bid': float(best_bid),
-            'best_bid_size': float(best_bid_size),
-            'best_ask': float(best_ask),
-            'best_ask_size': float(best_ask_size)
-        })
+        self.ticks_buffer.append((float(timestamp), float(best_bid), float(best_bid_size),
+                                  float(best_ask), float(best_ask_size)))
         shared_state.state['binance_ticks'] += 1
 
     def flush_if_needed(self):
@@ -56,16 +57,18 @@ class BinanceDataLogger:
         base_dir = os.path.join(DATA_DIR, self.coin, "SPOT", date_folder)
         
         try:
-            os.makedirs(base_dir, exist_ok=True)
+            if base_dir not in _created_dirs:
+                os.makedirs(base_dir, exist_ok=True)
+                _created_dirs.add(base_dir)
 
             if self.trades_buffer:
-                df = pd.DataFrame(self.trades_buffer)
+                df = pd.DataFrame.from_records(self.trades_buffer, columns=TRADE_COLUMNS).astype(TRADE_DTYPES)
                 df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
                 df.to_parquet(os.path.join(base_dir, f"{time_suffix}_trades.parquet"), index=False)
                 self.trades_buffer.clear()
 
             if self.ticks_buffer:
-                df = pd.DataFrame(self.ticks_buffer)
+                df = pd.DataFrame.from_records(self.ticks_buffer, columns=TICK_COLUMNS).astype(TICK_DTYPES)
                 df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
                 df.to_parquet(os.path.join(base_dir, f"{time_suffix}_ticks.parquet"), index=False)
                 self.ticks_buffer.clear()
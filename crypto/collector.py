@@ -15,7 +15,7 @@ _ROOT = os.path.dirname(_HERE)
 sys.path.insert(0, _HERE)
 
 import shared_state
-from ws_client import main_daemon
+from ws_client import main_daemon, install_event_loop_policy
 from binance_logger import binance_ws_loop
 
 console = Console()
@@ -83,7 +83,7 @@ def generate_dashboard() -> Layout:
     
     body_table.add_row("", "")
     body_table.add_row("[yellow]Next Disk Flush In[/yellow]", f"[yellow]{flush_time}s[/yellow]")
-    body_table.add_row("[magenta]Next Node.js API Slugs Rotation In[/magenta]", f"[magenta]{slug_time}s[/magenta]")
+    body_table.add_row("[magenta]Next Gamma API Slugs Rotation In[/magenta]", f"[magenta]{slug_time}s[/magenta]")
 
     layout["metrics"].update(Panel(body_table, title="[bold]Concurrent Telemetry Mappings[/bold]"))
     
@@ -124,6 +124,7 @@ async def run_orchestration():
         pass
 
 if __name__ == "__main__":
+    install_event_loop_policy()
     try:
         asyncio.run(run_orchestration())
     except KeyboardInterrupt:
@@ -0,0 +1,162 @@
+import os
+import sys
+import asyncio
+import datetime
+from zoneinfo import ZoneInfo
+
+import aiohttp
+import orjson
+
+# ── Allow running directly as `python crypto/fetch_tokens.py` ───────────────
+_HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, _HERE)
+
+GAMMA_URL = "https://gamma-api.polymarket.com/events"
+# Gamma API bugs out and caps results if limit=1000 is used
+PAGE_SIZE = 100
+ET = ZoneInfo("America/New_York")
+
+COINS = ['btc', 'eth']
+LONG_NAMES = {'btc': 'bitcoin', 'eth': 'ethereum', 'sol': 'solana', 'xrp': 'xrp'}
+
+def expected_1h_slugs(coin_long):
+    """The current and next three hourly slugs, named after the ET hour they resolve in."""
+    slugs = []
+    now = datetime.datetime.now(ET)
+    for i in range(4):
+        d = now + datetime.timedelta(hours=i)
+        month = d.strftime("%B").lower()
+        hour = d.hour % 12 or 12
+        ampm = "am" if d.hour < 12 else "pm"
+        slugs.append(f"{coin_long}-up-or-down-{month}-{d.day}-{hour}{ampm}-et")
+    return slugs
+
+async def fetch_active_events(session):
+    all_data = []
+    offset = 0
+    while True:
+        try:
+            params = {"active": "true", "closed": "false", "limit": PAGE_SIZE, "offset": offset}
+            async with session.get(GAMMA_URL, params=params) as r:
+                status = r.status
+                data = orjson.loads(await r.read())
+        except Exception as e:
+            print(f"Fetch error: {e}")
+            break
+        # An error body (e.g. {"error": ...}) ends paging; the pages already fetched are kept
+        if status != 200 or not isinstance(data, list):
+            print(f"Fetch error: HTTP {status} at offset {offset}")
+            break
+        if not data:
+            break
+        all_data.extend(data)
+        offset += PAGE_SIZE
+    return all_data
+
+def _parse_date(s):
+    return datetime.datetime.fromisoformat(s.replace('Z', '+00:00'))
+
+def process_subset(subset, is_1h):
+    res = []
+    series_id = ''
+    series_slug = ''
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    three_hours_later = now + datetime.timedelta(hours=3)
+
+    for event in subset:
+        end_str = event.get('endDate') or event.get('end_date')
+        if not end_str:
+            continue
+        try:
+            end_date = _parse_date(end_str)
+        except ValueError:
+            continue
+
+        # Skip past markets
+        if end_date <= now:
+            continue
+
+        # For 15m and 5m, apply the 3-hour strict ceiling
+        # (1h is already strictly constrained by the 4 explicitly generated ET slugs)
+        if not is_1h and end_date > three_hours_later:
+            continue
+
+        markets = event.get('markets') or []
+        active_markets = [m for m in markets if m.get('active')]
+        market = active_markets[0] if active_markets else (markets[0] if markets else None)
+        if not market:
+            continue
+
+        if not series_id and event.get('series_id'):
+            series_id = str(event['series_id'])
+        if not series_slug and event.get('tags'):
+            tag = next((t for t in event['tags'] if t.get('slug')), None)
+            if tag:
+                series_slug = tag
+
+        try:
+            outcomes = orjson.loads(market.get('outcomes') or '[]')
+            prices = orjson.loads(market.get('outcomePrices') or '[]')
+            clob_token_ids = orjson.loads(market.get('clobTokenIds') or '[]')
+        except orjson.JSONDecodeError:
+            continue
+
+        if len(outcomes) < 2 or len(prices) < 2 or len(clob_token_ids) < 2:
+            continue
+
+        tokens = {}
+        for outcome, price, token_id in zip(outcomes, prices, clob_token_ids):
+            tokens[outcome.lower()] = {
+                'token_id': token_id,
+                'outcome': outcome,
+                'price': str(price)
+            }
+
+        res.append({
+            'event_slug': event.get('slug'),
+            'condition_id': event.get('condition_id') or market.get('conditionId') or market.get('condition_id'),
+            'end_date': end_str,
+            'tokens': tokens
+        })
+
+    res.sort(key=lambda e: _parse_date(e['end_date']))
+    return {'series_id': series_id, 'series_slug': series_slug, 'events': res}
+
+async def fetch_events(session):
+    """Snapshots the active BTC/ETH up-or-down events into the routing layout ws_client expects."""
+    all_data = await fetch_active_events(session)
+
+    output = {
+        'discovered_at': datetime.datetime.now(datetime.timezone.utc).isoformat().replace('+00:00', 'Z'),
+        'source': 'Polymarket Event Fetcher (Active Snapshot)',
+        'markets': {'BTC': {}, 'ETH': {}, 'SOL': {}, 'XRP': {}}
+    }
+
+    for coin in COINS:
+        # Exact slug matching for 1h sequentially mapped to ET time
+        expected = set(expected_1h_slugs(LONG_NAMES[coin]))
+        events_1h = [e for e in all_data if e.get('slug') in expected]
+
+        # Broad includes for 15m and 5m
+        events_15m = [e for e in all_data if f"{coin}-updown-15m" in (e.get('slug') or '')]
+        events_5m = [e for e in all_data if f"{coin}-updown-5m" in (e.get('slug') or '')]
+
+        output['markets'][coin.upper()] = {
+            '1h': process_subset(events_1h, True),
+            '15m': process_subset(events_15m, False),
+            '5m': process_subset(events_5m, False),
+        }
+
+    return output
+
+async def main():
+    async with aiohttp.ClientSession() as session:
+        data = await fetch_events(session)
+    out_path = os.path.join(_HERE, 'polymarket_data_fetched.json')
+    with open(out_path, 'wb') as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    print(f"Saved to {out_path}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
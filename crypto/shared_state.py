@@ -13,3 +13,13 @@ state = {
     'start_time': time.time(),
     'markets': {} # Tracks individual market stats
 }
+
+# Slots of `counts`, incremented per stored event by ws_client; sync_counters()
+# copies them into `state` for the dashboard.
+TRADES, SNAPSHOTS, TICKS = 0, 1, 2
+counts = [0, 0, 0]
+
+def sync_counters():
+    state['polymarket_trades'] = counts[TRADES]
+    state['polymarket_snapshots'] = counts[SNAPSHOTS]
+    state['polymarket_ticks'] = counts[TICKS]
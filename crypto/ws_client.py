@@ -1,168 +1,347 @@
-import json
+import orjson
 import os
 import sys
 import asyncio
 import websockets
+import aiohttp
 import datetime
+import math
+import heapq
 import time
-import pandas as pd
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from array import array
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 # ── Allow running directly as `python crypto/ws_client.py` ──────────────────
 _HERE = os.path.dirname(os.path.abspath(__file__))
 _ROOT = os.path.dirname(_HERE)
+sys.path.insert(0, _ROOT)
 sys.path.insert(0, _HERE)
 
 import shared_state
+import fetch_tokens
+from shared_state import counts, TRADES, SNAPSHOTS, TICKS
+from arrow_columns import TIMESTAMP, book_column, timestamp_column
 
 # Project-root-relative data directory
 DATA_DIR = os.path.join(_ROOT, "data")
 
+FLUSH_INTERVAL = 900 # 15 minutes
+
+BOOK_LEVEL = pa.struct([('price', pa.float64()), ('size', pa.float64())])
+BOOK_TYPE = pa.list_(BOOK_LEVEL)
+
+# Explicit schemas keep hourly files concatenable even when a batch has no BBO values
+TRADES_SCHEMA = pa.schema([
+    ('timestamp', TIMESTAMP),
+    ('market_slug', pa.string()),
+    ('asset_id', pa.string()),
+    ('price', pa.float64()),
+    ('size', pa.float64()),
+    ('side', pa.string()),
+    ('end_date', pa.string()),
+])
+
+SNAPSHOTS_SCHEMA = pa.schema([
+    ('timestamp', TIMESTAMP),
+    ('market_slug', pa.string()),
+    ('asset_id', pa.string()),
+    ('bids', BOOK_TYPE),
+    ('asks', BOOK_TYPE),
+    ('end_date', pa.string()),
+])
+
+TICKS_SCHEMA = pa.schema([
+    ('timestamp', TIMESTAMP),
+    ('market_slug', pa.string()),
+    ('asset_id', pa.string()),
+    ('price', pa.float64()),
+    ('size', pa.float64()),
+    ('side', pa.string()),
+    ('best_bid', pa.float64()),
+    ('best_ask', pa.float64()),
+])
+
+# Slugs, asset ids, sides and end dates repeat on every row: dictionary + RLE pages
+# collapse them to small ints. Min/max statistics are only useful on timestamps.
+PARQUET_OPTIONS = {
+    'compression': 'zstd',
+    'compression_level': 1,
+    'use_dictionary': ['market_slug', 'asset_id', 'side', 'end_date'],
+    'write_statistics': ['timestamp'],
+    'data_page_size': 1 << 20,
+}
+
+# Parquet encoding and file I/O run here so a flush never stalls the websocket recv loop
+_flush_executor = ThreadPoolExecutor(max_workers=2)
+
+def _to_float(value, default=math.nan):
+    """Parses a WS price/size field (str, number or None) once; NaN marks a missing or 'N/A' value."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+def _to_millis(value):
+    """Parses a WS epoch-ms timestamp (str or number) to an int once; 0 when missing."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
 class DataLogger:
     def __init__(self, coin, timeframe, market_slug, end_date):
         self.coin = coin
         self.timeframe = timeframe
         self.market_slug = market_slug
         self.end_date = end_date
-        self.trades_buffer = []
-        self.snapshots_buffer = []
-        self.ticks_buffer = []
+        self._reset_trades()
+        self._reset_snapshots()
+        self._reset_ticks()
         self.last_flush = time.time()
-        self.flush_interval = 900 # 15 minutes
+        self.flush_interval = FLUSH_INTERVAL
+        
+        self._write_lock = threading.Lock()
+        # prefix -> (date_folder, ParquetWriter) for the daily file currently being appended
+        self._writers = {}
+        self._closed = False
+        
+        self.session_trades = 0 # Copied into the dashboard's per-market stats by counters_loop()
         
         # Deduplication state
-        self.last_snapshot = None # (bids_json, asks_json)
+        self.last_snapshot = None # (bids, asks)
         self.last_tick = None     # (price, size, side, best_bid, best_ask)
 
     def add_snapshot(self, timestamp, asset_id, bids, asks):
-        # Deduplicate: only add if the orderbook actually changed
-        bids_json = json.dumps(bids)
-        asks_json = json.dumps(asks)
-        if self.last_snapshot == (bids_json, asks_json):
+        # Deduplicate: only add if the orderbook actually changed. The decoded level lists
+        # are kept as-is and only converted to a nested Arrow column at flush.
+        book = (bids, asks)
+        if self.last_snapshot == book:
             return
 
-        self.snapshots_buffer.append({
-            'timestamp': float(timestamp) if timestamp else 0,
-            'market_slug': self.market_slug,
-            'asset_id': asset_id,
-            'bids': bids_json,
-            'asks': asks_json,
-            'end_date': self.end_date
-        })
-        self.last_snapshot = (bids_json, asks_json)
-        shared_state.state['polymarket_snapshots'] += 1
+        self.snap_ts.append(timestamp)
+        self.snap_asset_id.append(asset_id)
+        self.snap_bids.append(bids)
+        self.snap_asks.append(asks)
+        self.last_snapshot = book
+        counts[SNAPSHOTS] += 1
 
     def add_tick(self, timestamp, asset_id, price, size, side, best_bid, best_ask):
-        # Deduplicate ticks/BBO updates
-        this_tick = (float(price), float(size), side, best_bid, best_ask)
+        # Numeric fields arrive already parsed by process_ws_message (NaN = no quote)
+        this_tick = (price, size, side, best_bid, best_ask)
         if self.last_tick == this_tick:
             return
 
-        self.ticks_buffer.append({
-            'timestamp': float(timestamp) if timestamp else 0,
-            'market_slug': self.market_slug,
-            'asset_id': asset_id,
-            'price': float(price),
-            'size': float(size),
-            'side': side,
-            'best_bid': float(best_bid) if best_bid != 'N/A' else None,
-            'best_ask': float(best_ask) if best_ask != 'N/A' else None
-        })
+        self.tick_ts.append(timestamp)
+        self.tick_asset_id.append(asset_id)
+        self.tick_price.append(price)
+        self.tick_size.append(size)
+        self.tick_side.append(side)
+        self.tick_best_bid.append(best_bid)
+        self.tick_best_ask.append(best_ask)
         self.last_tick = this_tick
-        shared_state.state['polymarket_ticks'] += 1
+        counts[TICKS] += 1
 
     def add_trade(self, timestamp, asset_id, price, size, side):
-        self.trades_buffer.append({
-            'timestamp': float(timestamp) if timestamp else 0,
-            'market_slug': self.market_slug,
-            'asset_id': asset_id,
-            'price': float(price),
-            'size': float(size),
-            'side': side,
-            'end_date': self.end_date
-        })
-        shared_state.state['polymarket_trades'] += 1
-        if self.market_slug in shared_state.state['markets']:
-            shared_state.state['markets'][self.market_slug]['trades'] += 1
-
-    def flush_if_needed(self):
-        if time.time() - self.last_flush >= self.flush_interval:
-            self.flush()
-
-    def flush(self):
-        now = datetime.datetime.now(datetime.timezone.utc)
-        date_folder = now.strftime("%Y-%m-%d")
-        time_suffix = now.strftime("%H_00") # Hourly files
+        self.trade_ts.append(timestamp)
+        self.trade_asset_id.append(asset_id)
+        self.trade_price.append(price)
+        self.trade_size.append(size)
+        self.trade_side.append(side)
+        counts[TRADES] += 1
+        self.session_trades += 1
 
-        base_dir = os.path.join(DATA_DIR, self.coin, self.timeframe, self.market_slug, date_folder)
+    def flush(self, wait=False):
+        """Drains the buffers on the caller's thread and writes them on the flush executor.
         
+        wait=True writes inline instead, for shutdown paths where the loop is going away.
+        """
+        # Submitted even when empty: the write rotates writers, so a quiet market
+        # still finalizes yesterday's files on the first flush after midnight
+        self._submit(self._drain(), wait)
+
+        self.last_flush = time.time()
+        shared_state.state['next_flush_time'] = self.last_flush + self.flush_interval
+
+    def close(self, wait=False):
+        """Final flush for a retired market; finalizes its daily files so they become readable."""
+        self._closed = True
+        self._submit(self._drain(), wait)
+
+    def _submit(self, tables, wait):
+        date_folder = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d")
         try:
-            os.makedirs(base_dir, exist_ok=True)
+            loop = None if wait else asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None:
+            self._write(date_folder, tables)
+        else:
+            loop.run_in_executor(_flush_executor, self._write, date_folder, tables)
 
-            for target_buffer, prefix in [(self.trades_buffer, "trades"), 
-                                          (self.snapshots_buffer, "snapshots"), 
-                                          (self.ticks_buffer, "ticks")]:
-                if not target_buffer:
-                    continue
-                
-                new_df = pd.DataFrame(target_buffer)
-                new_df['timestamp'] = pd.to_datetime(new_df['timestamp'], unit='ms', utc=True)
-                
-                file_path = os.path.join(base_dir, f"{time_suffix}_{prefix}.parquet")
-                
-                # Check for existing hourly file to append
-                if os.path.exists(file_path):
-                    try:
-                        old_df = pd.read_parquet(file_path)
-                        final_df = pd.concat([old_df, new_df], ignore_index=True)
-                        final_df.to_parquet(file_path, index=False)
-                    except Exception:
-                        new_df.to_parquet(file_path, index=False)
-                else:
-                    new_df.to_parquet(file_path, index=False)
+    def _drain(self):
+        # Swap the buffers out so the recv loop keeps appending while the write runs
+        tables = []
+        for rows, build_table, reset, prefix in [(len(self.trade_ts), self._trades_table, self._reset_trades, "trades"), 
+                                                 (len(self.snap_ts), self._snapshots_table, self._reset_snapshots, "snapshots"), 
+                                                 (len(self.tick_ts), self._ticks_table, self._reset_ticks, "ticks")]:
+            if not rows:
+                continue
+            try:
+                tables.append((prefix, build_table()))
+            except Exception as e:
+                print(f"[Flush] Dropped {rows} {prefix} rows for {self.market_slug}: {e}")
+            reset()
+        return tables
+
+    def _write(self, date_folder, tables):
+        # Runs on a worker thread; the lock keeps two flushes of one market from interleaving
+        with self._write_lock:
+            try:
+                self._rotate_writers(date_folder)
                 
-                target_buffer.clear()
+                # Each flush appends a row group to the market's file for the day
+                for prefix, table in tables:
+                    self._get_writer(date_folder, prefix, table.schema).write_table(table)
+            except Exception as e:
+                print(f"[Flush] Parquet write failed for {self.market_slug}: {e}")
+            
+            if self._closed:
+                self._rotate_writers(None)
 
-        except Exception as e:
-            pass
+    def _rotate_writers(self, date_folder):
+        # Finalizes (writes the footer of) any file from an earlier day
+        for prefix, (writer_date, writer) in list(self._writers.items()):
+            if writer_date != date_folder:
+                try:
+                    writer.close()
+                except Exception:
+                    pass
+                del self._writers[prefix]
 
-        self.last_flush = time.time()
-        shared_state.state['next_flush_time'] = self.last_flush + self.flush_interval
+    def _get_writer(self, date_folder, prefix, schema):
+        current = self._writers.get(prefix)
+        if current is not None:
+            return current[1]
+        
+        base_dir = os.path.join(DATA_DIR, self.coin, self.timeframe, self.market_slug, date_folder)
+        os.makedirs(base_dir, exist_ok=True)
+        
+        file_path = os.path.join(base_dir, f"{prefix}.parquet")
+        part = 1
+        while os.path.exists(file_path):
+            # Never clobber a finalized file (e.g. after a daemon restart)
+            file_path = os.path.join(base_dir, f"{prefix}_{part}.parquet")
+            part += 1
+        
+        writer = pq.ParquetWriter(file_path, schema, **PARQUET_OPTIONS)
+        self._writers[prefix] = (date_folder, writer)
+        return writer
+
+    # Buffers are column-wise (one typed array or list per field) so flush can hand
+    # them to Arrow directly, without building a dict per row or a DataFrame.
+
+    def _reset_trades(self):
+        self.trade_ts = array('q')
+        self.trade_asset_id = []
+        self.trade_price = array('d')
+        self.trade_size = array('d')
+        self.trade_side = []
+
+    def _reset_snapshots(self):
+        self.snap_ts = array('q')
+        self.snap_asset_id = []
+        self.snap_bids = []
+        self.snap_asks = []
+
+    def _reset_ticks(self):
+        self.tick_ts = array('q')
+        self.tick_asset_id = []
+        self.tick_price = array('d')
+        self.tick_size = array('d')
+        self.tick_side = []
+        self.tick_best_bid = array('d')
+        self.tick_best_ask = array('d')
+
+    def _trades_table(self):
+        n = len(self.trade_ts)
+        return pa.Table.from_arrays([
+            timestamp_column(self.trade_ts),
+            pa.array([self.market_slug] * n, type=pa.string()),
+            pa.array(self.trade_asset_id, type=pa.string()),
+            pa.array(self.trade_price, type=pa.float64()),
+            pa.array(self.trade_size, type=pa.float64()),
+            pa.array(self.trade_side, type=pa.string()),
+            pa.array([self.end_date] * n, type=pa.string()),
+        ], schema=TRADES_SCHEMA)
+
+    def _snapshots_table(self):
+        n = len(self.snap_ts)
+        return pa.Table.from_arrays([
+            timestamp_column(self.snap_ts),
+            pa.array([self.market_slug] * n, type=pa.string()),
+            pa.array(self.snap_asset_id, type=pa.string()),
+            book_column(self.snap_bids, BOOK_TYPE),
+            book_column(self.snap_asks, BOOK_TYPE),
+            pa.array([self.end_date] * n, type=pa.string()),
+        ], schema=SNAPSHOTS_SCHEMA)
+
+    def _ticks_table(self):
+        n = len(self.tick_ts)
+        return pa.Table.from_arrays([
+            timestamp_column(self.tick_ts),
+            pa.array([self.market_slug] * n, type=pa.string()),
+            pa.array(self.tick_asset_id, type=pa.string()),
+            pa.array(self.tick_price, type=pa.float64()),
+            pa.array(self.tick_size, type=pa.float64()),
+            pa.array(self.tick_side, type=pa.string()),
+            # NaN marks a missing BBO in the buffer; from_pandas turns it into a null
+            pa.array(self.tick_best_bid, type=pa.float64(), from_pandas=True),
+            pa.array(self.tick_best_ask, type=pa.float64(), from_pandas=True),
+        ], schema=TICKS_SCHEMA)
+
+def install_event_loop_policy():
+    """Use uvloop's libuv-backed event loop where it is installed; it has no Windows build.
+    
+    Must run before the loop is created, i.e. before asyncio.run().
+    """
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
 
 # --- Global State ---
 # Maps token_id (string) -> { 'coin', 'timeframe', 'slug', 'side', 'logger' }
 active_tokens = {}
+active_tokens_version = 0   # Bumped by update_global_routing when the token set changes
+subscription_payload = None # Subscribe frame for active_tokens, rebuilt with the version
+# Set by update_global_routing when the subscription changes; wakes the connection's _subscriber
+routing_changed = asyncio.Event()
+# token_id -> slug of the routing currently in active_tokens
+_routing = {}
 
 async def update_markets_loop():
     """Background task to fetch Gamma API tokens every 15 minutes."""
-    fetch_script = os.path.join(_HERE, 'fetch_tokens.js')
-    json_out = os.path.join(_HERE, 'polymarket_data_fetched.json')
-    while True:
-        try:
-            process = await asyncio.create_subprocess_shell(
-                f'node "{fetch_script}"',
-                stdout=asyncio.subprocess.PIPE, 
-                stderr=asyncio.subprocess.PIPE)
+    # One session for the daemon's lifetime keeps the Gamma TLS connection alive between refreshes
+    async with aiohttp.ClientSession() as session:
+        while True:
             try:
-                await asyncio.wait_for(process.communicate(), timeout=30.0)
-            except asyncio.TimeoutError:
-                process.kill()
-                await process.communicate()
-                raise Exception("Node API Zombie Timeout")
-            
-            if os.path.exists(json_out):
-                with open(json_out, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    update_global_routing(data)
-            
-        except Exception as e:
-            pass
-            
-        await asyncio.sleep(15 * 60) # Wait 15 minutes
+                data = await asyncio.wait_for(fetch_tokens.fetch_events(session), timeout=30.0)
+                update_global_routing(data)
+                
+            except Exception as e:
+                pass
+                
+            await asyncio.sleep(15 * 60) # Wait 15 minutes
 
 
 def update_global_routing(data):
     """Parses the JSON and specifically tracks sliding windows for BTC/ETH out of all events."""
-    global active_tokens
+    global active_tokens, active_tokens_version, subscription_payload, _routing
     
     old_loggers = { meta['slug']: meta['logger'] for meta in active_tokens.values() }
     new_active_tokens = {}
@@ -194,8 +373,8 @@ def update_global_routing(data):
                 except:
                     continue
                     
-            future_events.sort(key=lambda x: x[0])
-            active_slice = future_events[:limit]
+            # Only the `limit` soonest windows are tracked, so skip the full sort
+            active_slice = heapq.nsmallest(limit, future_events, key=lambda x: x[0])
             
             for _, ev in active_slice:
                 slug = ev.get('event_slug')
@@ -206,7 +385,8 @@ def update_global_routing(data):
                 no_obj = tokens.get('no') or tokens.get('down')
                 if not yes_obj or not no_obj: continue
                 
-                logger = old_loggers.get(slug, DataLogger(coin, tf, slug, end_date))
+                # Only build a logger for a newly tracked slug; a get() default would construct one every refresh
+                logger = old_loggers.get(slug) or DataLogger(coin, tf, slug, end_date)
                 
                 new_active_tokens[yes_obj['token_id']] = {
                     'coin': coin, 'timeframe': tf, 'slug': slug, 'side': 'YES', 'logger': logger
@@ -221,7 +401,7 @@ def update_global_routing(data):
                         'coin': coin,
                         'timeframe': tf,
                         'end_date': end_date,
-                        'trades': logger.trades_buffer.__len__() if logger else 0
+                        'trades': logger.session_trades
                     }
                 
     active_slugs_set = set(tracked_slugs)
@@ -229,11 +409,19 @@ def update_global_routing(data):
     for s in keys_to_remove:
         del shared_state.state['markets'][s]
         
-    for token_id, meta in active_tokens.items():
-        if token_id not in new_active_tokens:
-             meta['logger'].flush()
+    retired = { meta['logger'] for token_id, meta in active_tokens.items() if token_id not in new_active_tokens }
+    for logger in retired:
+         logger.close()
              
-    active_tokens = new_active_tokens
+    # An unchanged token -> slug routing keeps the live table; only a real change swaps it in
+    routing = { token_id: meta['slug'] for token_id, meta in new_active_tokens.items() }
+    if routing != _routing:
+        if new_active_tokens.keys() != active_tokens.keys():
+            subscription_payload = orjson.dumps({"assets_ids": list(new_active_tokens), "type": "market"}).decode()
+            active_tokens_version += 1
+            routing_changed.set()
+        active_tokens = new_active_tokens
+        _routing = routing
     shared_state.state['slugs_active'] = len(active_slugs_set)
     shared_state.state['next_slug_update'] = time.time() + 900
 
@@ -244,36 +432,25 @@ async def subscribe_and_listen():
     backoff = 3
     async for websocket in websockets.connect(url, ping_interval=10, ping_timeout=10):
         backoff = 3
-        last_data_time = time.time()
-        current_sub_ids = []
+        frames = [0]
+        watchdog = asyncio.create_task(_watchdog(websocket, frames))
+        subscriber = asyncio.create_task(_subscriber(websocket))
         
         try:
             while True:
-                latest_ids = list(active_tokens.keys())
-                if set(latest_ids) != set(current_sub_ids) and latest_ids:
-                    sub_msg = { "assets_ids": latest_ids, "type": "market" }
-                    await websocket.send(json.dumps(sub_msg))
-                    current_sub_ids = latest_ids
-                
-                try:
-                    response = await asyncio.wait_for(websocket.recv(), timeout=1.0)
-                    data = json.loads(response)
-                    last_data_time = time.time()
-                    
-                    if isinstance(data, list):
-                        for msg in data:
-                            process_ws_message(msg)
-                    else:
-                        process_ws_message(data)
-                except asyncio.TimeoutError:
-                    if time.time() - last_data_time > 60:
-                        raise Exception("Watchdog timeout - No data for 60s")
-                except websockets.exceptions.ConnectionClosed:
-                    raise
+                # A bare recv() returns already-buffered frames without suspending, so bursts
+                # are drained back to back. Silence is the watchdog task's job, which spares
+                # every frame the Task and timer that wait_for() would create.
+                # Raw frame bytes go straight to orjson, skipping the UTF-8 decode to str.
+                response = await websocket.recv(decode=False)
+                frames[0] += 1
+                data = orjson.loads(response)
                 
-                unique_loggers = { meta['logger'] for meta in active_tokens.values() }
-                for logger in unique_loggers:
-                     logger.flush_if_needed()
+                if isinstance(data, list):
+                    for msg in data:
+                        process_ws_message(msg)
+                else:
+                    process_ws_message(data)
                     
         except websockets.exceptions.ConnectionClosed:
             await asyncio.sleep(backoff)
@@ -285,48 +462,105 @@ async def subscribe_and_listen():
             await asyncio.sleep(backoff)
             backoff = min(60, backoff * 2)
             continue
+        finally:
+            watchdog.cancel()
+            subscriber.cancel()
 
 
-def process_ws_message(msg):
-    event_type = msg.get('event_type')
-    asset_id = msg.get('asset_id')
-    
-    if not asset_id and event_type != 'price_change':
-        return
-        
-    server_time = msg.get('timestamp', '0')
+async def periodic_flush():
+    """Flushes every active logger once per FLUSH_INTERVAL, keeping that walk off the recv path."""
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        for logger in { meta['logger'] for meta in active_tokens.values() }:
+            logger.flush()
+
+
+async def counters_loop():
+    """Copies the event counters and per-market trade counts into shared_state every second."""
+    while True:
+        shared_state.sync_counters()
+        markets = shared_state.state['markets']
+        for meta in active_tokens.values():
+            entry = markets.get(meta['slug'])
+            if entry is not None:
+                entry['trades'] = meta['logger'].session_trades
+        await asyncio.sleep(1)
+
+
+async def _subscriber(websocket):
+    """Sends the subscription on connect and again whenever the routed token set changes.
     
-    if event_type == 'book':
-        bids = msg.get('bids', [])
-        asks = msg.get('asks', [])
-        meta = active_tokens.get(asset_id)
-        if not meta: return
-        meta['logger'].add_snapshot(server_time, asset_id, bids, asks)
-
-    elif event_type == 'price_change':
-        changes = msg.get('price_changes', [])
-        for change in changes:
-            c_asset = change.get('asset_id')
-            meta = active_tokens.get(c_asset)
-            if not meta: continue
-            
-            price = change.get('price')
-            size = change.get('size')
-            side = change.get('side')
-            best_bid = change.get('best_bid', 'N/A')
-            best_ask = change.get('best_ask', 'N/A')
-            
-            meta['logger'].add_tick(server_time, c_asset, price, size, side, best_bid, best_ask)
+    Runs beside the recv loop so a routing change goes out immediately, even on a quiet socket.
+    """
+    sent_version = -1
+    try:
+        while True:
+            if active_tokens_version != sent_version and active_tokens:
+                sent_version = active_tokens_version
+                await websocket.send(subscription_payload)
+            await routing_changed.wait()
+            routing_changed.clear()
+    except websockets.exceptions.ConnectionClosed:
+        pass
+
+
+async def _watchdog(websocket, frames, timeout=60):
+    """Closes the connection if no frame arrived for `timeout` seconds, forcing a reconnect."""
+    seen = frames[0]
+    while True:
+        await asyncio.sleep(timeout)
+        if frames[0] == seen:
+            await websocket.close()
+            return
+        seen = frames[0]
+
+
+def _handle_book(msg, tokens):
+    meta = tokens.get(msg.get('asset_id'))
+    if not meta: return
+    meta['logger'].add_snapshot(_to_millis(msg.get('timestamp')), msg['asset_id'], msg.get('bids', []), msg.get('asks', []))
 
-    elif event_type == 'last_trade_price':
-        meta = active_tokens.get(asset_id)
-        if not meta: return
+
+def _handle_price_change(msg, tokens):
+    server_time = _to_millis(msg.get('timestamp'))
+    get_meta = tokens.get
+    for change in msg.get('price_changes', ()):
+        c_asset = change.get('asset_id')
+        meta = get_meta(c_asset)
+        if not meta: continue
+        
+        price = _to_float(change.get('price'))
+        size = _to_float(change.get('size'))
+        side = change.get('side')
+        best_bid = _to_float(change.get('best_bid'))
+        best_ask = _to_float(change.get('best_ask'))
         
-        price = msg.get('price')
-        size = msg.get('size')
-        side = msg.get('side', 'UNKNOWN')
-        if price is None or size is None: return
-        meta['logger'].add_trade(server_time, asset_id, price, size, side)
+        meta['logger'].add_tick(server_time, c_asset, price, size, side, best_bid, best_ask)
+
+
+def _handle_trade(msg, tokens):
+    meta = tokens.get(msg.get('asset_id'))
+    if not meta: return
+    price = msg.get('price')
+    size = msg.get('size')
+    side = msg.get('side', 'UNKNOWN')
+    if price is None or size is None: return
+    meta['logger'].add_trade(_to_millis(msg.get('timestamp')), msg['asset_id'], float(price), float(size), side)
+
+
+HANDLERS = {
+    'book': _handle_book,
+    'price_change': _handle_price_change,
+    'last_trade_price': _handle_trade,
+}
+
+
+def _noop(msg, tokens):
+    pass
+
+
+def process_ws_message(msg):
+    HANDLERS.get(msg.get('event_type'), _noop)(msg, active_tokens)
 
 
 async def main_daemon():
@@ -339,12 +573,14 @@ async def main_daemon():
          await asyncio.sleep(1)
          
     ws_task = asyncio.create_task(subscribe_and_listen())
+    flush_task = asyncio.create_task(periodic_flush())
+    counters_task = asyncio.create_task(counters_loop())
     
     try:
-        await asyncio.gather(fetcher_task, ws_task)
+        await asyncio.gather(fetcher_task, ws_task, flush_task, counters_task)
     except (KeyboardInterrupt, asyncio.CancelledError):
         pass
     finally:
         unique_loggers = { meta['logger'] for meta in active_tokens.values() }
         for l in unique_loggers:
-             l.flush()
+             l.close(wait=True)
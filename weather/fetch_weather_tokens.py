@@ -9,6 +9,8 @@ _HERE = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, _HERE)
 
 GAMMA_URL = "https://gamma-api.polymarket.com/events"
+# Reused across every slug lookup (and every 15-minute refresh) to keep the TLS connection alive
+SESSION = requests.Session()
 CITIES = ["london", "seoul", "nyc", "toronto", "wellington", "atlanta", "chicago", "seattle", "buenos-aires", "miami"]
 
 def generate_weather_slugs(city, target_date):
@@ -46,7 +48,7 @@ def fetch_events():
             event = None
             for slug in slugs_to_try:
                 try:
-                    r = requests.get(f"{GAMMA_URL}?slug={slug}", timeout=10)
+                    r = SESSION.get(GAMMA_URL, params={"slug": slug}, timeout=10)
                     if r.status_code == 200:
                         data = r.json()
                         if data and isinstance(data, list) and len(data) > 0:
@@ -98,16 +100,19 @@ def fetch_events():
                         "tokens": tokens_dict
                     })
 
-    output_data = {
+    return {
         "discovered_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
         "events": all_events
     }
+
+def main():
+    output_data = fetch_events()
     
     # Always write to the weather/ folder alongside this script
     out_path = os.path.join(_HERE, 'weather_data_fetched.json')
     with open(out_path, 'w') as f:
         json.dump(output_data, f, indent=2)
-    print(f"Weather tokens fetched: {len(all_events)} individual buckets.")
+    print(f"Weather tokens fetched: {len(output_data['events'])} individual buckets.")
 
 if __name__ == "__main__":
-    fetch_events()
+    main()
@@ -35,13 +35,15 @@ class MetricBox(Static):
     def __init__(self, title: str, id: str):
         super().__init__(id=id)
         self.title_str = title
+        self._value_widget = None
         
     def compose(self) -> ComposeResult:
         yield Label(self.title_str, classes="metric-title")
-        yield Digits("0", id=f"{self.id}-value", classes="metric-value")
+        self._value_widget = Digits("0", id=f"{self.id}-value", classes="metric-value")
+        yield self._value_widget
         
     def update_val(self, new_val):
-        self.query_one(f"#{self.id}-value", Digits).update(str(new_val))
+        self._value_widget.update(str(new_val))
 
 
 class WeatherDashboard(App):
@@ -100,6 +102,12 @@ class WeatherDashboard(App):
     def on_mount(self) -> None:
         self.title = "Polymarket Weather Collector Engine"
         self.table.add_columns("City", "Question", "End Date", "Live Trades")
+        # Resolve the metric widgets once instead of walking the DOM every tick
+        self.mb_saved = self.query_one("#mb-saved", MetricBox)
+        self.mb_active_tokens = self.query_one("#active-tokens", MetricBox)
+        self.mb_clob_trades = self.query_one("#clob-trades", MetricBox)
+        self.mb_clob_ticks = self.query_one("#clob-ticks", MetricBox)
+        self.mb_clob_snapshots = self.query_one("#clob-snapshots", MetricBox)
         self.set_interval(1.0, self.update_dashboard)
         self.run_daemon()
 
@@ -111,11 +119,11 @@ class WeatherDashboard(App):
         mb_saved = get_dir_size()
         weather_shared_state.state['mb_saved'] = mb_saved
         
-        self.query_one("#mb-saved").update_val(f"{mb_saved:.2f}")
-        self.query_one("#active-tokens").update_val(f"{weather_shared_state.state['slugs_active']}")
-        self.query_one("#clob-trades").update_val(f"{weather_shared_state.state['polymarket_trades']:,}")
-        self.query_one("#clob-ticks").update_val(f"{weather_shared_state.state['polymarket_ticks']:,}")
-        self.query_one("#clob-snapshots").update_val(f"{weather_shared_state.state['polymarket_snapshots']:,}")
+        self.mb_saved.update_val(f"{mb_saved:.2f}")
+        self.mb_active_tokens.update_val(f"{weather_shared_state.state['slugs_active']}")
+        self.mb_clob_trades.update_val(f"{weather_shared_state.state['polymarket_trades']:,}")
+        self.mb_clob_ticks.update_val(f"{weather_shared_state.state['polymarket_ticks']:,}")
+        self.mb_clob_snapshots.update_val(f"{weather_shared_state.state['polymarket_snapshots']:,}")
         
         markets = weather_shared_state.state.get('markets', {})
         existing_keys = [row_key.value for row_key in self.table.rows]
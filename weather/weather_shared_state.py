@@ -11,3 +11,13 @@ state = {
     'start_time': time.time(),
     'markets': {} # Tracks individual market stats
 }
+
+# Hot-path event counters, bumped directly by the WS client as plain list slots
+# and published into `state` once a second by sync_counters().
+TRADES, SNAPSHOTS, TICKS = 0, 1, 2
+counts = [0, 0, 0]
+
+def sync_counters():
+    state['polymarket_trades'] = counts[TRADES]
+    state['polymarket_snapshots'] = counts[SNAPSHOTS]
+    state['polymarket_ticks'] = counts[TICKS]
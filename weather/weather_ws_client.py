@@ -1,21 +1,114 @@
-import json
+import orjson
 import os
 import sys
 import asyncio
+import collections
 import websockets
+from websockets.asyncio.client import connect
 import datetime
 import time
-import pandas as pd
+import threading
+from array import array
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 
 # ── Allow running directly as `python weather/weather_ws_client.py` ──────────
 _HERE = os.path.dirname(os.path.abspath(__file__))
 _ROOT = os.path.dirname(_HERE)
+sys.path.insert(0, _ROOT)
 sys.path.insert(0, _HERE)
 
 import weather_shared_state
+from weather_shared_state import counts, TRADES, SNAPSHOTS, TICKS
+import fetch_weather_tokens
+from arrow_columns import (TIMESTAMP, PRICE, SIZE, book_column, price_field, size_field,
+                           timestamp_column, to_fixed)
 
 DATA_DIR = os.path.join(_ROOT, "data", "weather")
 
+# Explicit schemas keep every row group of an hourly file identical, even when a
+# batch has no BBO values to infer a type from. Low-cardinality strings are
+# dictionary-encoded so they cost one small dictionary page per row group.
+DICT_STRING = pa.dictionary(pa.int32(), pa.string())
+SIDE_TYPE = pa.dictionary(pa.int8(), pa.string())
+
+# Prices and sizes use arrow_columns' fixed-point encoding (int32/int64 at 1e6)
+NO_QUOTE = -1 # Buffered in place of a missing best bid/ask; written as null
+
+TRADE_DEDUP_WINDOW = 64 # Recent trade fingerprints remembered per market
+
+BOOK_LEVEL = pa.struct([price_field('price'), size_field('size')])
+BOOK_TYPE = pa.list_(BOOK_LEVEL)
+
+TRADES_SCHEMA = pa.schema([
+    ('timestamp', TIMESTAMP),
+    ('market_slug', DICT_STRING),
+    ('condition_id', DICT_STRING),
+    ('asset_id', DICT_STRING),
+    price_field('price'),
+    size_field('size'),
+    ('side', SIDE_TYPE),
+    ('end_date', DICT_STRING),
+])
+
+SNAPSHOTS_SCHEMA = pa.schema([
+    ('timestamp', TIMESTAMP),
+    ('market_slug', DICT_STRING),
+    ('condition_id', DICT_STRING),
+    ('asset_id', DICT_STRING),
+    ('bids', BOOK_TYPE),
+    ('asks', BOOK_TYPE),
+    ('end_date', DICT_STRING),
+])
+
+TICKS_SCHEMA = pa.schema([
+    ('timestamp', TIMESTAMP),
+    ('market_slug', DICT_STRING),
+    ('condition_id', DICT_STRING),
+    ('asset_id', DICT_STRING),
+    price_field('price'),
+    size_field('size'),
+    ('side', SIDE_TYPE),
+    price_field('best_bid'),
+    price_field('best_ask'),
+])
+
+# Trade and tick sides are buffered as int8 codes into this fixed dictionary
+SIDES = ('BUY', 'SELL', 'UNKNOWN')
+SIDE_CODES = {side: code for code, side in enumerate(SIDES)}
+SIDE_DICTIONARY = pa.array(SIDES, type=pa.string())
+UNKNOWN_SIDE = SIDE_CODES['UNKNOWN']
+
+PARQUET_OPTIONS = {'compression': 'zstd', 'compression_level': 3}
+
+def dictionary_columns(schema):
+    """Columns worth parquet dictionary pages: the low-cardinality ones, not prices or books."""
+    return [field.name for field in schema if pa.types.is_dictionary(field.type)]
+
+_suffix_cache = [None, None] # [hour since epoch, "%H_00" suffix]
+
+def current_time_suffix():
+    """Hourly file prefix. A shutdown sweep computes it once and shares it across loggers."""
+    hour = int(time.time() // 3600)
+    if hour != _suffix_cache[0]:
+        _suffix_cache[:] = [hour, datetime.datetime.now(datetime.timezone.utc).strftime("%H_00")]
+    return _suffix_cache[1]
+
+def constant_column(value, length):
+    """Builds a dictionary column repeating one per-logger value without boxing `length` strings."""
+    if value is None:
+        return pa.nulls(length, type=DICT_STRING)
+    indices = pa.repeat(pa.scalar(0, pa.int32()), length)
+    return pa.DictionaryArray.from_arrays(indices, pa.array([value], type=pa.string()))
+
+def quote_column(quotes):
+    column = pa.array(quotes, type=PRICE)
+    return pc.if_else(pc.equal(column, NO_QUOTE), pa.scalar(None, PRICE), column)
+
+def side_column(codes):
+    return pa.DictionaryArray.from_arrays(pa.array(codes, type=pa.int8()), SIDE_DICTIONARY)
+
 class DataLogger:
     def __init__(self, city, target_date, condition_id, market_slug, end_date):
         self.city = city
@@ -23,142 +116,267 @@ class DataLogger:
         self.condition_id = condition_id
         self.market_slug = market_slug
         self.end_date = end_date
-        self.trades_buffer = []
-        self.snapshots_buffer = []
-        self.ticks_buffer = []
+        self.base_dir = os.path.join(DATA_DIR, city, target_date, condition_id)
+        self._reset_trades()
+        self._reset_snapshots()
+        self._reset_ticks()
         self.last_flush = time.time()
         self.flush_interval = 900 # 15 minutes
         weather_shared_state.state['next_flush_time'] = self.last_flush + self.flush_interval
         
+        # One timer per logger replaces polling flush deadlines on every WS message
+        try:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self._on_timer)
+        except RuntimeError:
+            self._timer = None # No event loop (one-off use); callers flush explicitly
+        
         # Deduplication state
-        self.last_snapshot = None # (bids_json, asks_json)
-        self.last_tick = None     # (price, size, side, best_bid, best_ask)
+        self.last_snapshot = None # (bids, asks) of the last stored book
+        self.last_tick = None     # (price, size, side, best_bid, best_ask) as received
+        self._recent_trades = collections.deque() # FIFO of the last TRADE_DEDUP_WINDOW fingerprints
+        self._recent_trade_set = set()            # Same fingerprints, for O(1) membership
+
+        # Per-market trade count, published to the dashboard by counters_loop()
+        self.session_trades = 0
+
+        # prefix -> (time_suffix, ParquetWriter) for the hourly file currently being appended
+        self._writers = {}
+        # Timer flushes write on executor threads; this keeps them and close() from interleaving
+        self._write_lock = threading.Lock()
+        self._closed = False
 
     def add_snapshot(self, timestamp, asset_id, bids, asks):
-        # Deduplicate: only add if the orderbook actually changed
-        bids_json = json.dumps(bids)
-        asks_json = json.dumps(asks)
-        if self.last_snapshot == (bids_json, asks_json):
+        # Books stay as the decoded level lists until flush, so the hot path neither hashes
+        # nor converts them. Comparing against the previous book stops at the first change.
+        book = (bids, asks)
+        if self.last_snapshot == book:
             return
             
-        self.snapshots_buffer.append({
-            'timestamp': float(timestamp) if timestamp else 0,
-            'market_slug': self.market_slug,
-            'condition_id': self.condition_id,
-            'asset_id': asset_id,
-            'bids': bids_json,
-            'asks': asks_json,
-            'end_date': self.end_date
-        })
-        self.last_snapshot = (bids_json, asks_json)
-        weather_shared_state.state['polymarket_snapshots'] += 1
+        self.snap_ts.append(int(float(timestamp)) if timestamp else 0)
+        self.snap_asset_id.append(asset_id)
+        self.snap_bids.append(bids)
+        self.snap_asks.append(asks)
+        self.last_snapshot = book
+        counts[SNAPSHOTS] += 1
 
     def add_tick(self, timestamp, asset_id, price, size, side, best_bid, best_ask):
-        # Deduplicate ticks/BBO updates
-        this_tick = (float(price), float(size), side, best_bid, best_ask)
+        # best_bid/best_ask arrive already in fixed point (NO_QUOTE when missing); the
+        # rest dedups on the raw values, so repeats skip parsing entirely.
+        this_tick = (price, size, side, best_bid, best_ask)
         if self.last_tick == this_tick:
             return
             
-        self.ticks_buffer.append({
-            'timestamp': float(timestamp) if timestamp else 0,
-            'market_slug': self.market_slug,
-            'condition_id': self.condition_id,
-            'asset_id': asset_id,
-            'price': float(price),
-            'size': float(size),
-            'side': side,
-            'best_bid': float(best_bid) if best_bid != 'N/A' else None,
-            'best_ask': float(best_ask) if best_ask != 'N/A' else None
-        })
+        self.tick_ts.append(int(float(timestamp)) if timestamp else 0)
+        self.tick_asset_id.append(asset_id)
+        self.tick_price.append(to_fixed(price))
+        self.tick_size.append(to_fixed(size))
+        self.tick_side.append(SIDE_CODES.get(side, UNKNOWN_SIDE))
+        self.tick_best_bid.append(best_bid)
+        self.tick_best_ask.append(best_ask)
         self.last_tick = this_tick
-        weather_shared_state.state['polymarket_ticks'] += 1
+        counts[TICKS] += 1
 
     def add_trade(self, timestamp, asset_id, price, size, side):
-        self.trades_buffer.append({
-            'timestamp': float(timestamp) if timestamp else 0,
-            'market_slug': self.market_slug,
-            'condition_id': self.condition_id,
-            'asset_id': asset_id,
-            'price': float(price),
-            'size': float(size),
-            'side': side,
-            'end_date': self.end_date
-        })
-        weather_shared_state.state['polymarket_trades'] += 1
-        if self.condition_id in weather_shared_state.state['markets']:
-            weather_shared_state.state['markets'][self.condition_id]['trades'] += 1
-
-    def flush_if_needed(self):
-        if time.time() - self.last_flush >= self.flush_interval:
-            self.flush()
-            return True
-        return False
-
-    def flush(self):
-        now = datetime.datetime.now(datetime.timezone.utc)
-        time_suffix = now.strftime("%H_00") # Hourly files
-
-        base_dir = os.path.join(DATA_DIR, self.city, self.target_date, self.condition_id)
+        # last_trade_price is re-emitted for the same fill; skip fingerprints seen recently
+        fingerprint = (int(float(timestamp)) if timestamp else 0, asset_id,
+                       to_fixed(price), to_fixed(size), SIDE_CODES.get(side, UNKNOWN_SIDE))
+        if fingerprint in self._recent_trade_set:
+            return
+        self._recent_trades.append(fingerprint)
+        self._recent_trade_set.add(fingerprint)
+        if len(self._recent_trades) > TRADE_DEDUP_WINDOW:
+            self._recent_trade_set.discard(self._recent_trades.popleft())
         
-        try:
-            os.makedirs(base_dir, exist_ok=True)
+        ts, _, price, size, side_code = fingerprint
+        self.trade_ts.append(ts)
+        self.trade_asset_id.append(asset_id)
+        self.trade_price.append(price)
+        self.trade_size.append(size)
+        self.trade_side.append(side_code)
+        counts[TRADES] += 1
+        self.session_trades += 1
 
-            for target_buffer, prefix in [(self.trades_buffer, "trades"), 
-                                          (self.snapshots_buffer, "snapshots"), 
-                                          (self.ticks_buffer, "ticks")]:
-                if not target_buffer:
-                    continue
-                
-                new_df = pd.DataFrame(target_buffer)
-                new_df['timestamp'] = pd.to_datetime(new_df['timestamp'], unit='ms', utc=True)
-                
-                file_path = os.path.join(base_dir, f"{time_suffix}_{prefix}.parquet")
-                
-                # Check for existing hourly file to append
-                if os.path.exists(file_path):
-                    try:
-                        old_df = pd.read_parquet(file_path)
-                        final_df = pd.concat([old_df, new_df], ignore_index=True)
-                        final_df.to_parquet(file_path, index=False)
-                    except Exception:
-                        new_df.to_parquet(file_path, index=False)
-                else:
-                    new_df.to_parquet(file_path, index=False)
+    def flush(self, time_suffix=None):
+        if time_suffix is None:
+            time_suffix = current_time_suffix()
+        self._write(time_suffix, self._drain())
+        self.last_flush = time.time()
+        weather_shared_state.state['next_flush_time'] = self.last_flush + self.flush_interval
+
+    def _drain(self):
+        """Turns the buffered rows into Arrow tables and empties the buffers (event loop side)."""
+        tables = []
+        for prefix, schema, rows, build_table, reset in [
+                ("trades", TRADES_SCHEMA, len(self.trade_ts), self._trades_table, self._reset_trades),
+                ("snapshots", SNAPSHOTS_SCHEMA, len(self.snap_ts), self._snapshots_table, self._reset_snapshots),
+                ("ticks", TICKS_SCHEMA, len(self.tick_ts), self._ticks_table, self._reset_ticks)]:
+            if not rows:
+                continue
+            try:
+                tables.append((prefix, schema, build_table()))
+            except Exception as e:
+                print(f"[Flush] Dropped {rows} {prefix} rows for {self.market_slug}: {e}")
+            finally:
+                # Books are parsed here now, so a malformed batch is dropped rather than retried forever
+                reset()
+        return tables
+
+    def _write(self, time_suffix, tables):
+        """Appends drained tables to this hour's files. Safe to run on a worker thread."""
+        with self._write_lock:
+            try:
+                self._rotate_writers(time_suffix)
                 
-                target_buffer.clear()
+                # Append a row group to this hour's file instead of rewriting it
+                for prefix, schema, table in tables:
+                    self._get_writer(time_suffix, prefix, schema).write_table(table)
+            except Exception as e:
+                print(f"[Flush] Parquet write failed for {self.market_slug}: {e}")
+            
+            if self._closed:
+                # A timer write that was still queued when close() ran must not leave files open
+                self._rotate_writers(None)
 
-        except Exception:
-            pass
+    # Buffers are column-wise: flat C arrays for the numeric fields (timestamps as int64 ms) and plain
+    # lists for strings. Timestamps are wrapped zero-copy at flush; the rest go through pa.array.
 
+    def _reset_trades(self):
+        self.trade_ts = array('q')
+        self.trade_asset_id = []
+        self.trade_price = array('i')
+        self.trade_size = array('q')
+        self.trade_side = array('b')
+
+    def _reset_snapshots(self):
+        self.snap_ts = array('q')
+        self.snap_asset_id = []
+        self.snap_bids = []
+        self.snap_asks = []
+
+    def _reset_ticks(self):
+        self.tick_ts = array('q')
+        self.tick_asset_id = []
+        self.tick_price = array('i')
+        self.tick_size = array('q')
+        self.tick_side = array('b')
+        self.tick_best_bid = array('i')
+        self.tick_best_ask = array('i')
+
+    def _trades_table(self):
+        n = len(self.trade_ts)
+        return pa.Table.from_arrays([
+            timestamp_column(self.trade_ts),
+            constant_column(self.market_slug, n),
+            constant_column(self.condition_id, n),
+            pa.array(self.trade_asset_id, type=DICT_STRING),
+            pa.array(self.trade_price, type=PRICE),
+            pa.array(self.trade_size, type=SIZE),
+            side_column(self.trade_side),
+            constant_column(self.end_date, n),
+        ], schema=TRADES_SCHEMA)
+
+    def _snapshots_table(self):
+        n = len(self.snap_ts)
+        return pa.Table.from_arrays([
+            timestamp_column(self.snap_ts),
+            constant_column(self.market_slug, n),
+            constant_column(self.condition_id, n),
+            pa.array(self.snap_asset_id, type=DICT_STRING),
+            book_column(self.snap_bids, BOOK_TYPE, to_fixed),
+            book_column(self.snap_asks, BOOK_TYPE, to_fixed),
+            constant_column(self.end_date, n),
+        ], schema=SNAPSHOTS_SCHEMA)
+
+    def _ticks_table(self):
+        n = len(self.tick_ts)
+        return pa.Table.from_arrays([
+            timestamp_column(self.tick_ts),
+            constant_column(self.market_slug, n),
+            constant_column(self.condition_id, n),
+            pa.array(self.tick_asset_id, type=DICT_STRING),
+            pa.array(self.tick_price, type=PRICE),
+            pa.array(self.tick_size, type=SIZE),
+            side_column(self.tick_side),
+            quote_column(self.tick_best_bid),
+            quote_column(self.tick_best_ask),
+        ], schema=TICKS_SCHEMA)
+
+    def _on_timer(self):
+        # Only the drain runs on the loop. pyarrow drops the GIL while encoding and writing,
+        # so loggers whose timers fire together write their files in parallel on the executor.
+        time_suffix = current_time_suffix()
+        asyncio.get_running_loop().run_in_executor(None, self._write, time_suffix, self._drain())
         self.last_flush = time.time()
         weather_shared_state.state['next_flush_time'] = self.last_flush + self.flush_interval
+        self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self._on_timer)
+
+    def close(self, time_suffix=None, wait=False):
+        """Flushes the remaining buffers and finalizes every open hourly file.
+
+        A retired market's final write goes to the executor like a timer flush;
+        wait=True (shutdown) writes inline so the files are complete on return.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._closed = True
+        try:
+            loop = None if wait else asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None:
+            self.flush(time_suffix)
+        else:
+            loop.run_in_executor(None, self._write, time_suffix or current_time_suffix(), self._drain())
+
+    def _rotate_writers(self, time_suffix):
+        # Closing writes the parquet footer, so an hour's file only becomes readable here
+        for prefix, (writer_suffix, writer) in list(self._writers.items()):
+            if writer_suffix != time_suffix:
+                try:
+                    writer.close()
+                except Exception:
+                    pass
+                del self._writers[prefix]
+
+    def _get_writer(self, time_suffix, prefix, schema):
+        current = self._writers.get(prefix)
+        if current is not None:
+            return current[1]
+        
+        # Only opening a new hourly file touches the filesystem; appends skip the makedirs stat
+        base_dir = self.base_dir
+        os.makedirs(base_dir, exist_ok=True)
+        file_path = os.path.join(base_dir, f"{time_suffix}_{prefix}.parquet")
+        part = 1
+        while os.path.exists(file_path):
+            # Never clobber a finished hour (daemon restart, or the same hour on a later day)
+            file_path = os.path.join(base_dir, f"{time_suffix}_{prefix}_{part}.parquet")
+            part += 1
+        
+        writer = pq.ParquetWriter(file_path, schema, use_dictionary=dictionary_columns(schema), **PARQUET_OPTIONS)
+        self._writers[prefix] = (time_suffix, writer)
+        return writer
 
 # --- Global State ---
 active_tokens = {}
+# condition_id -> DataLogger for every routed market, maintained by update_global_routing
+active_loggers = {}
+# Bumped whenever the routed token set changes; consumers cache derived state against it
+active_tokens_version = 0
+# Serialized subscribe frame for the current token set; rebuilt only when the set changes
+subscription_payload = None
 
 async def update_markets_loop():
-    fetch_script = os.path.join(_HERE, 'fetch_weather_tokens.py')
-    json_out = os.path.join(_HERE, 'weather_data_fetched.json')
+    loop = asyncio.get_running_loop()
     while True:
         try:
-            print(f"[Daemon] Updating weather markets via {fetch_script}...")
-            # Use sys.executable to ensure we use the same conda env
-            process = await asyncio.create_subprocess_shell(
-                f'"{sys.executable}" "{fetch_script}"',
-                stdout=asyncio.subprocess.PIPE, 
-                stderr=asyncio.subprocess.PIPE)
-            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=60.0)
-            
-            if process.returncode != 0:
-                print(f"[Daemon] Error fetching tokens: {stderr.decode()}")
-            
-            if os.path.exists(json_out):
-                with open(json_out, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    update_global_routing(data)
-                    print(f"[Daemon] Successfully updated routing. Active: {weather_shared_state.state['slugs_active']} buckets.")
-            else:
-                print(f"[Daemon] JSON output not found at {json_out}")
+            print("[Daemon] Updating weather markets via Gamma API...")
+            # The fetcher is blocking `requests` code, so run it on the default executor
+            data = await asyncio.wait_for(
+                loop.run_in_executor(None, fetch_weather_tokens.fetch_events), timeout=60.0)
+            update_global_routing(data)
+            print(f"[Daemon] Successfully updated routing. Active: {weather_shared_state.state['slugs_active']} buckets.")
             
         except Exception as e:
             print(f"[Daemon] Exception in update loop: {e}")
@@ -167,27 +385,27 @@ async def update_markets_loop():
 
 
 def update_global_routing(data):
-    global active_tokens
+    global active_tokens, active_tokens_version, subscription_payload
     
-    old_loggers = { meta['condition_id']: meta['logger'] for meta in active_tokens.values() }
     new_active_tokens = {}
+    markets = weather_shared_state.state['markets']
     
-    tracked_cids = []
-    events = data.get('events', [])
-    for ev in events:
-        city = ev.get('city')
-        target_date = ev.get('date')
-        market_slug = ev.get('market_slug')
-        condition_id = ev.get('condition_id')
-        question = ev.get('question', '')
-        end_date = ev.get('end_date')
+    # Single pass over the events; retired markets fall out as set differences below
+    new_cids = set()
+    for ev in data.get('events', []):
         tokens = ev.get('tokens', {})
-        
         yes_obj = tokens.get('yes')
         no_obj = tokens.get('no')
         if not yes_obj or not no_obj: continue
         
-        logger = old_loggers.get(condition_id, DataLogger(city, target_date, condition_id, market_slug, end_date))
+        city = ev.get('city')
+        condition_id = ev.get('condition_id')
+        end_date = ev.get('end_date')
+        
+        logger = active_loggers.get(condition_id)
+        if logger is None:
+            logger = DataLogger(city, ev.get('date'), condition_id, ev.get('market_slug'), end_date)
+            active_loggers[condition_id] = logger
         
         new_active_tokens[yes_obj['token_id']] = {
             'city': city, 'condition_id': condition_id, 'side': 'YES', 'logger': logger
@@ -195,27 +413,27 @@ def update_global_routing(data):
         new_active_tokens[no_obj['token_id']] = {
             'city': city, 'condition_id': condition_id, 'side': 'NO', 'logger': logger
         }
-        tracked_cids.append(condition_id)
+        new_cids.add(condition_id)
         
-        if condition_id not in weather_shared_state.state['markets']:
-            weather_shared_state.state['markets'][condition_id] = {
+        if condition_id not in markets:
+            markets[condition_id] = {
                 'city': city,
-                'question': question,
+                'question': ev.get('question', ''),
                 'end_date': end_date,
                 'trades': 0
             }
                 
-    active_cid_set = set(tracked_cids)
-    keys_to_remove = [s for s in weather_shared_state.state['markets'].keys() if s not in active_cid_set]
-    for s in keys_to_remove:
-        del weather_shared_state.state['markets'][s]
+    for cid in markets.keys() - new_cids:
+        del markets[cid]
         
-    for token_id, meta in active_tokens.items():
-        if token_id not in new_active_tokens:
-             meta['logger'].flush()
+    for cid in active_loggers.keys() - new_cids:
+        active_loggers.pop(cid).close()
              
+    if new_active_tokens.keys() != active_tokens.keys():
+        subscription_payload = orjson.dumps({"assets_ids": list(new_active_tokens), "type": "market"}).decode()
+        active_tokens_version += 1
     active_tokens = new_active_tokens
-    weather_shared_state.state['slugs_active'] = len(active_cid_set)
+    weather_shared_state.state['slugs_active'] = len(new_cids)
     weather_shared_state.state['next_slug_update'] = time.time() + 900
 
 
@@ -224,25 +442,31 @@ async def subscribe_and_listen():
     print(f"[Daemon] Connecting to Polymarket CLOB at {url}...")
     
     backoff = 3
-    async for websocket in websockets.connect(url, ping_interval=10, ping_timeout=10):
+    # Pure consumer loop: permessage-deflate would only add per-frame inflate cost
+    async for websocket in connect(url, ping_interval=10, ping_timeout=10, compression=None):
         print("[Daemon] WebSocket Connected.")
         backoff = 3
         last_data_time = time.time()
-        current_sub_ids = []
+        sent_version = -1
+        last_frame = None
         
         try:
             while True:
-                latest_ids = list(active_tokens.keys())
-                if set(latest_ids) != set(current_sub_ids) and latest_ids:
-                    sub_msg = { "assets_ids": latest_ids, "type": "market" }
-                    await websocket.send(json.dumps(sub_msg))
-                    current_sub_ids = latest_ids
+                if active_tokens_version != sent_version and active_tokens:
+                    sent_version = active_tokens_version
+                    await websocket.send(subscription_payload)
                 
                 try:
-                    response = await asyncio.wait_for(websocket.recv(), timeout=1.0)
-                    data = json.loads(response)
+                    # decode=False hands over the raw frame bytes, which orjson parses without a UTF-8 round-trip
+                    response = await asyncio.wait_for(websocket.recv(decode=False), timeout=1.0)
                     last_data_time = time.time()
                     
+                    # A byte-identical resend (e.g. replayed books) is dropped before decoding
+                    if response == last_frame:
+                        continue
+                    last_frame = response
+                    data = orjson.loads(response)
+                    
                     if isinstance(data, list):
                         for msg in data:
                             process_ws_message(msg)
@@ -253,15 +477,6 @@ async def subscribe_and_listen():
                         raise Exception("Watchdog timeout")
                 except websockets.exceptions.ConnectionClosed:
                     raise
-                
-                unique_loggers = { meta['logger'] for meta in active_tokens.values() }
-                flushed_any = False
-                for logger in unique_loggers:
-                     if logger.flush_if_needed():
-                         flushed_any = True
-                
-                if flushed_any:
-                    print(f"[Daemon] Hourly flush complete for {len(unique_loggers)} loggers.")
                     
         except websockets.exceptions.ConnectionClosed:
             await asyncio.sleep(backoff)
@@ -275,43 +490,68 @@ async def subscribe_and_listen():
             continue
 
 
-def process_ws_message(msg):
-    event_type = msg.get('event_type')
-    asset_id = msg.get('asset_id')
-    
-    if not asset_id and event_type != 'price_change':
-        return
-        
+def _handle_book(msg, tokens):
+    meta = tokens.get(msg.get('asset_id'))
+    if not meta: return
+    meta['logger'].add_snapshot(msg.get('timestamp', '0'), msg['asset_id'], msg.get('bids', []), msg.get('asks', []))
+
+
+# Placeholder values the feed sends for an empty side of the book
+MISSING_QUOTES = (None, '', 'N/A')
+
+def _handle_price_change(msg, tokens):
+    # Price changes carry their asset ids per change; hoist the lookup out of the loop
     server_time = msg.get('timestamp', '0')
-    
-    if event_type == 'book':
-        bids = msg.get('bids', [])
-        asks = msg.get('asks', [])
-        meta = active_tokens.get(asset_id)
-        if not meta: return
-        meta['logger'].add_snapshot(server_time, asset_id, bids, asks)
-
-    elif event_type == 'price_change':
-        changes = msg.get('price_changes', [])
-        for change in changes:
-            c_asset = change.get('asset_id')
-            meta = active_tokens.get(c_asset)
-            if not meta: continue
-            price = change.get('price')
-            size = change.get('size')
-            side = change.get('side')
-            best_bid = change.get('best_bid', 'N/A')
-            best_ask = change.get('best_ask', 'N/A')
-            meta['logger'].add_tick(server_time, c_asset, price, size, side, best_bid, best_ask)
-
-    elif event_type == 'last_trade_price':
-        meta = active_tokens.get(asset_id)
-        if not meta: return
-        price = msg.get('price')
-        size = msg.get('size')
-        side = msg.get('side', 'UNKNOWN')
-        if price is None or size is None: return
-        meta['logger'].add_trade(server_time, asset_id, price, size, side)
+    get_meta = tokens.get
+    for change in msg.get('price_changes', ()):
+        c_asset = change.get('asset_id')
+        c_meta = get_meta(c_asset)
+        if not c_meta: continue
+        price = change.get('price')
+        size = change.get('size')
+        side = change.get('side')
+        best_bid = change.get('best_bid')
+        best_ask = change.get('best_ask')
+        best_bid = to_fixed(best_bid) if best_bid not in MISSING_QUOTES else NO_QUOTE
+        best_ask = to_fixed(best_ask) if best_ask not in MISSING_QUOTES else NO_QUOTE
+        c_meta['logger'].add_tick(server_time, c_asset, price, size, side, best_bid, best_ask)
+
+
+def _handle_trade(msg, tokens):
+    meta = tokens.get(msg.get('asset_id'))
+    if not meta: return
+    price = msg.get('price')
+    size = msg.get('size')
+    side = msg.get('side', 'UNKNOWN')
+    if price is None or size is None: return
+    meta['logger'].add_trade(msg.get('timestamp', '0'), msg['asset_id'], price, size, side)
+
+
+HANDLERS = {
+    'book': _handle_book,
+    'price_change': _handle_price_change,
+    'last_trade_price': _handle_trade,
+}
+
+
+def _noop(msg, tokens):
+    pass
+
+
+def process_ws_message(msg):
+    HANDLERS.get(msg.get('event_type'), _noop)(msg, active_tokens)
+
+
+async def counters_loop():
+    """Publishes the hot-path counters into the shared state once a second."""
+    while True:
+        weather_shared_state.sync_counters()
+        markets = weather_shared_state.state['markets']
+        for logger in active_loggers.values():
+            entry = markets.get(logger.condition_id)
+            if entry is not None:
+                entry['trades'] = logger.session_trades
+        await asyncio.sleep(1)
 
 
 async def terminal_heartbeat():
@@ -353,12 +593,13 @@ async def main_daemon():
          
     ws_task = asyncio.create_task(subscribe_and_listen())
     heartbeat_task = asyncio.create_task(terminal_heartbeat())
+    counters_task = asyncio.create_task(counters_loop())
     
     try:
-        await asyncio.gather(fetcher_task, ws_task, heartbeat_task)
+        await asyncio.gather(fetcher_task, ws_task, heartbeat_task, counters_task)
     except (KeyboardInterrupt, asyncio.CancelledError):
         pass
     finally:
-        unique_loggers = { meta['logger'] for meta in active_tokens.values() }
-        for l in unique_loggers:
-             l.flush()
+        time_suffix = current_time_suffix()
+        for l in active_loggers.values():
+             l.close(time_suffix, wait=True)